@@ -1,5 +1,19 @@
 # app.py
 import streamlit as st
+from db_utils import (
+    TREND_DAYS,
+    ProjectRecord,
+    default_projects,
+    get_change_listener,
+    load_all_projects,
+    load_metric_trends,
+    load_projects,
+    project_session_keys,
+    sync_watermarks
+)
+from hf_utils import get_inference_stats, get_setting, start_model_warm_up
+from narrative_backends import backends_need_token, backends_use_hf
+from narrative_utils import generate_all_narratives
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -9,177 +23,182 @@ st.set_page_config(
 )
 
 st.title("AI Division Leader Sync Dashboard")
-st.caption(f"Data shown reflects the current session. Last updated: {st.query_params.get('updated', 'N/A')}")
-
-# --- Initialize Session State ---
-# Initialize if they don't exist yet
-if 'vortex_data' not in st.session_state:
-    st.session_state['vortex_data'] = {
-        'update_bullets': "Default Vortex Update",
-        'metric_value': 0.0,
-        'metric_delta': 0.0,
-        'milestone': [],
-        'risk': "No risks entered yet.",
-        'update_summary': ''
-    }
-
-if 'ghostmachine_data' not in st.session_state:
-    st.session_state['ghostmachine_data'] = {
-        'update_bullets': "Default GhostMachine Initiative",
-        'metric_value': 0.0,
-        'metric_delta': 0.0,
-        'milestone': [],
-        'risk': "No risks entered yet.",
-        'update_summary': ''
-    }
-
-if 'platform_data' not in st.session_state:
-    st.session_state['platform_data'] = {
-        'initiative': 'Default Platform Initiative',
-        'metric_value': 0.0,
-        'metric_delta': 0.0,
-        'milestone': [],
-        'risk': 'No risks entered yet.'
-    }
+st.caption(f"Data shown reflects the latest saved project updates. Last updated: {st.query_params.get('updated', 'N/A')}")
+
+# --- Session Fallback Data ---
+# Sessions don't keep their own copies of project data: saved records are
+# shared through the process-wide cache, and what a session entered on the
+# input page is only shown when the database is unavailable.
+@st.cache_resource
+def placeholder_record(project_id):
+    """Placeholder record shared by every session until something is entered."""
+    return ProjectRecord(project_id, risk='No risks entered yet.')
+
+
+def session_record(project_id):
+    """Returns this session's data for a project as a record, or the shared placeholder."""
+    data = st.session_state.get(project_session_keys(project_id)[0])
+    if data is None:
+        return placeholder_record(project_id)
+    return ProjectRecord.from_data(data)
+
+
+# --- Load Project Data ---
+# Sections come from the projects registry. Every project is fetched in one
+# query, warming the shared cache the sections read from.
+projects = default_projects()
+trends = {}
+conn = None
+DB_URL = get_setting("DATABASE_URL", None)
+if DB_URL:
+    try:
+        conn = st.connection('postgres', type='sql', url=DB_URL)
+        projects = load_projects(conn)
+        load_all_projects(conn, projects)
+    except Exception as e:
+        st.warning(f"Could not load saved project data, showing this session's data: {e}")
+    if conn is not None:
+        try:
+            trends = load_metric_trends(conn, projects)
+        except Exception as e:
+            st.warning(f"Could not load metric history: {e}")
 
 # --- Display Area ---
 st.markdown("---")
 
-# --- Platform Dashboard Section ---
-st.header('Platform')
-with st.expander('Project Status', expanded=False):
-    p_data = st.session_state['platform_data']
-
-    row1_platform = st.columns(2)
-    row2_platform = st.columns(2)
-
-    with row1_platform[0]:
-        tile1_p = st.container(height=250, border=True)
-        tile1_p.subheader("Launch Initiatives")
-        tile1_p.write(p_data.get('initiative', 'N/A'))
-
-    with row1_platform[1]:
-        tile2_p = st.container(height=250, border=True)
-        tile2_p.subheader('Performance Metrics')
-        tile2_p.metric('Key Metric',
-                       value=p_data.get('metric_value', 0.0),
-                       delta=p_data.get('metric_delta', 0.0))
-
-    with row2_platform[0]:
-        tile3_p = st.container(height=250, border=True)
-        tile3_p.subheader("📅 Upcoming Milestones")
-        milestones_list = p_data.get('milestones', [])
-        if milestones_list:
-            sorted_milestones = sorted(milestones_list, key=lambda m: m['date'])
-            for i, m in enumerate(sorted_milestones):
-                date_str = m['date'].strftime('%Y-%m-%d')
-                tile3_p.write(f"**{date_str}:** {m['desc']}")
-        else:
-            tile3_p.write('No milesones entered yet.')
-
-    with row2_platform[1]:
-        title4_p = st.container(height=250, border=True)
-        title4_p.subheader("❓ Blockers / Risks")
-        title4_p.write(p_data.get('risk', 'N/A'))
-
-
-
-# --- Vortex Dashboard Section ---
-st.header("Vortex")
-with st.expander("Project Status", expanded=False):
-    v_data = st.session_state['vortex_data'] # Shortcut
-
-    row1_vortex = st.columns(2)
-    row2_vortex = st.columns(2)
-
-    with row1_vortex[0]:
-        tile1_v = st.container(height=250, border=True)
-        tile1_v.subheader("🚀 Launch Initiatives")
-        tile1_v.write(v_data.get('update_summary', 'N/A'))
-
-    with row1_vortex[1]:
-        tile2_v = st.container(height=250, border=True)
-        tile2_v.subheader("📊 Performance Metrics")
-        tile2_v.metric("Key Metric",
-                    value=v_data.get('metric_value', 0.0),
-                    delta=v_data.get('metric_delta', 0.0))
-
-    with row2_vortex[0]:
-        tile3_v = st.container(height=250, border=True)
-        tile3_v.subheader("📅 Upcoming Milestones")
-        milestones_list = v_data.get('milestones', []) # Get the list
-        if milestones_list:
-            # Sort by date before displaying (optional)
-            sorted_milestones = sorted(milestones_list, key=lambda m: m['date'])
-            for i, m in enumerate(sorted_milestones):
-                # Use strftime for consistent date formatting
-                date_str = m['date'].strftime('%Y-%m-%d') # Or '%m/%d/%Y'
-                tile3_v.write(f"**{date_str}:** {m['desc']}")
-        else:
-            tile3_v.write("No milestones entered yet.")
-
-    with row2_vortex[1]:
-        tile4_v = st.container(height=250, border=True)
-        tile4_v.subheader("❓ Blockers / Risks")
-        tile4_v.write(v_data.get('risk', 'N/A'))
-
-
-# --- GhostMachine Dashboard Section ---
-st.header("GhostMachine")
-with st.expander("Project Status", expanded=False):
-    g_data = st.session_state['ghostmachine_data'] # Shortcut
-
-    row1_ghost = st.columns(2)
-    row2_ghost = st.columns(2)
-
-    with row1_ghost[0]:
-        tile1_g = st.container(height=250, border=True)
-        tile1_g.subheader("🚀 Project Updates")
-        tile1_g.write(g_data.get('update_summary', 'N/A'))
-
-    with row1_ghost[1]:
-        tile2_g = st.container(height=250, border=True)
-        tile2_g.subheader("📊 Performance Metrics")
-        tile2_g.metric("Key Metric",
-                    value=g_data.get('metric_value', 0.0),
-                    delta=g_data.get('metric_delta', 0.0))
-
-    with row2_ghost[0]:
-        tile3_g = st.container(height=250, border=True)
-        tile3_g.subheader("📅 Upcoming Milestones")
-        milestones_list = g_data.get('milestones', []) # Get the list
-        if milestones_list:
-            sorted_milestones = sorted(milestones_list, key=lambda m: m['date'])
-            for i, m in enumerate(sorted_milestones):
-                date_str = m['date'].strftime('%Y-%m-%d')
-                tile3_g.write(f"**{date_str}:** {m['desc']}")
-        else:
-            tile3_g.write("No milestones entered yet.")
-
-    with row2_ghost[1]:
-        tile4_g = st.container(height=250, border=True)
-        tile4_g.subheader("❓ Blockers / Risks")
-        tile4_g.write(g_data.get('risk', 'N/A'))
-
-
-# --- Platform Dashboard Section ---
-st.header('Platform')
-with st.expander('Project Status', expanded=False):
-    p_data = st.session_state['platform_data']
-
-    row1_platform = st.columns(2)
-    row2_platform = st.columns(2)
-
-    with row1_platform[0]:
-        tile1_p = st.container(height=250, border=True)
-        tile1_p.subheader("Launch Initiatives")
-        tile1_p.write(p_data.get('initiative', 'N/A'))
-
-    with row1_platform[1]:
-        tile2_p = st.container(height=250, border=True)
-        tile2_p.subheader('Performance Metrics')
-        tile2_p.metric('Key Metric',
-                       value=p_data.get('metric_value', 0.0),
-                       delta=p_data.get('metric_delta', 0.0))
-
-st.sidebar.success("Select a project data entry page.")
\ No newline at end of file
+# Seconds between watermark polls when auto-refresh is on, and between checks
+# of the in-memory change counters while the change listener is connected.
+AUTO_REFRESH_SECONDS = 10
+LIVE_REFRESH_SECONDS = 2
+auto_refresh = st.sidebar.toggle(
+    'Auto-refresh',
+    key='auto_refresh',
+    disabled=conn is None,
+    help="Shows teammates' saves as they happen, redrawing only the projects that changed"
+)
+
+change_listener = None
+if auto_refresh and conn is not None:
+    try:
+        change_listener = get_change_listener(conn)
+    except Exception as e:
+        st.sidebar.warning(f"Live updates unavailable, polling instead: {e}")
+live_updates = change_listener is not None and change_listener.connected
+
+def project_record(project_id):
+    """Returns a project's saved record, or this session's data when the database is unavailable."""
+    if conn is not None:
+        try:
+            # Served from the shared cache warmed by the batch load above. A
+            # project without a dashboard_data row still has its saved milestones.
+            return load_all_projects(conn, [project_id])[project_id]
+        except Exception:
+            pass
+    return session_record(project_id)
+
+
+def draw_project_section(project_id):
+    """Draws one project's section; opening or closing it reruns only this section."""
+    project = projects[project_id]
+    st.header(f"{project.icon} {project.name}")
+    status = st.expander("Project Status", expanded=False, key=f"{project_id}_status", on_change="rerun")
+    # Tiles are only built while the expander is open.
+    if not status.open:
+        return
+
+    if live_updates:
+        # The listener already dropped changed rows from the cache; this only
+        # reads an in-memory counter.
+        version = change_listener.version(project_id)
+        seen_key = f"{project_id}_seen_version"
+        if st.session_state.setdefault(seen_key, version) != version:
+            st.session_state[seen_key] = version
+            st.toast(f"{project.name} was updated.")
+    elif auto_refresh and conn is not None:
+        # One shared watermark poll; the row is only re-read if it moved.
+        try:
+            sync_watermarks(conn, [project_id])
+        except Exception:
+            pass
+    data = project_record(project_id)
+    with status:
+        st.page_link('pages/1_Project_Input.py', label='Edit this project', icon='✏️',
+                     query_params={'project': project_id})
+        row1 = st.columns(2)
+        row2 = st.columns(2)
+
+        with row1[0]:
+            tile1 = st.container(height=250, border=True)
+            tile1.subheader(project.summary_title)
+            # The narrative when one was generated, else the bullets it is written from.
+            tile1.write(data.update_summary or data.update_bullets or 'N/A')
+
+        with row1[1]:
+            tile2 = st.container(height=250, border=True)
+            tile2.subheader("📊 Performance Metrics")
+            tile2.metric("Key Metric",
+                         value=data.metric_value,
+                         delta=data.metric_delta,
+                         chart_data=trends.get(project_id) or None,
+                         help=f"Trend over the last {TREND_DAYS} days")
+
+        with row2[0]:
+            tile3 = st.container(height=250, border=True)
+            tile3.subheader("📅 Upcoming Milestones")
+            if data.milestones:
+                # Records keep milestones in date order already
+                for m in data.milestones:
+                    date_str = m.date.strftime('%Y-%m-%d')
+                    tile3.write(f"**{date_str}:** {m.desc}")
+            else:
+                tile3.write("No milestones entered yet.")
+
+        with row2[1]:
+            tile4 = st.container(height=250, border=True)
+            tile4.subheader("❓ Blockers / Risks")
+            tile4.write(data.risk or 'N/A')
+
+
+refresh_every = None
+if auto_refresh:
+    refresh_every = LIVE_REFRESH_SECONDS if live_updates else AUTO_REFRESH_SECONDS
+project_section = st.fragment(draw_project_section, run_every=refresh_every)
+for project_id in projects:
+    project_section(project_id)
+
+# --- Weekly Sync: Generate Every Narrative ---
+HF_API_TOKEN = get_setting('HUGGINGFACE_API_TOKEN', None)
+
+# Start loading the model now so the first generation doesn't pay the cold start.
+if backends_use_hf():
+    start_model_warm_up(HF_API_TOKEN)
+
+if st.sidebar.button('✨ Generate all narratives',
+                     help='Writes a fresh narrative for every project from its saved update bullets',
+                     disabled=conn is None or (not HF_API_TOKEN and backends_need_token())):
+    with st.spinner('Generating narratives for every project...'):
+        try:
+            st.session_state['narrative_batch_errors'] = generate_all_narratives(conn, HF_API_TOKEN)
+        except Exception as e:
+            st.session_state['narrative_batch_failure'] = str(e)
+    st.rerun()
+
+batch_failure = st.session_state.pop('narrative_batch_failure', None)
+if batch_failure is not None:
+    st.sidebar.error(f"Could not generate narratives: {batch_failure}")
+
+batch_errors = st.session_state.pop('narrative_batch_errors', None)
+if batch_errors is not None:
+    for project_id, error in batch_errors.items():
+        st.sidebar.error(f"{project_id}: {error}")
+    if not batch_errors:
+        st.sidebar.success('All narratives generated!')
+
+with st.sidebar.expander('Inference load (this server)'):
+    stats = get_inference_stats().snapshot()
+    st.write(f"Upstream requests: {stats['upstream_requests']}")
+    st.write(f"Queued by rate limit: {stats['queued']}")
+    st.write(f"Coalesced duplicates: {stats['coalesced']}")
+    st.write(f"Rejected: {stats['rejected']}")
+
+st.sidebar.success("Open Project Input to enter data for any project.")
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""Compares Dashboard rerun time with every project's tiles built vs lazy sections.
+
+"eager" draws all four tiles for every project, as the hand-written sections
+did; "lazy" draws only the header and a closed expander, as the registry-driven
+Dashboard does until a section is opened. Records are synthetic and held in
+st.cache_resource, so the time is rendering, not querying: the Dashboard reads
+every project in one batched query either way.
+
+Run from the repository root:  python benchmarks/bench_dashboard_projects.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+PROJECT_COUNTS = (3, 10, 40)
+RERUNS = 5
+
+
+def dashboard_app(project_count, eager):
+    import datetime
+
+    import streamlit as st
+    from db_utils import ProjectRecord
+    from milestones import MilestoneList
+
+    @st.cache_resource
+    def records(n):
+        milestones = MilestoneList()
+        for i in range(10):
+            milestones.add(datetime.date(2026, 1, 1) + datetime.timedelta(days=7 * i), f'Milestone {i}')
+        return {
+            f'project_{i}': ProjectRecord(f'project_{i}', update_summary='The team shipped the release. ' * 10,
+                                          metric_value=42.0, metric_delta=1.5, milestones=tuple(milestones),
+                                          risk='Staffing is not confirmed yet. ' * 5)
+            for i in range(n)
+        }
+
+    def draw_tiles(data):
+        row1 = st.columns(2)
+        row2 = st.columns(2)
+        row1[0].container(height=250, border=True).write(data.update_summary)
+        row1[1].container(height=250, border=True).metric('Key Metric', value=data.metric_value,
+                                                          delta=data.metric_delta, chart_data=[1.0, 2.0, 3.0])
+        tile3 = row2[0].container(height=250, border=True)
+        for m in data.milestones:
+            tile3.write(f"**{m.date.strftime('%Y-%m-%d')}:** {m.desc}")
+        row2[1].container(height=250, border=True).write(data.risk)
+
+    for project_id, data in records(project_count).items():
+        st.header(project_id)
+        status = st.expander('Project Status', expanded=eager, key=f'{project_id}_status', on_change='rerun')
+        if status.open:
+            with status:
+                draw_tiles(data)
+
+
+def rerun_seconds(project_count, eager):
+    at = AppTest.from_function(dashboard_app, args=(project_count, eager), default_timeout=120)
+    at.run()
+    start = time.perf_counter()
+    for _ in range(RERUNS):
+        at.run()
+    return (time.perf_counter() - start) / RERUNS
+
+
+def main():
+    print('Dashboard rerun time, every section built vs lazy sections')
+    print(f"{'projects':>8} | {'eager':>8} | {'lazy':>8}")
+    for project_count in PROJECT_COUNTS:
+        eager = rerun_seconds(project_count, True)
+        lazy = rerun_seconds(project_count, False)
+        print(f'{project_count:>8} | {eager * 1000:>5.0f} ms | {lazy * 1000:>5.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Compares per-call overhead of bare requests.post against the pooled HF client.
+
+The stub runs over plain HTTP on loopback, so the saving shown is a lower bound:
+real calls also skip a TLS handshake and a network round trip per reuse.
+The pooled calls post through get_http_session() directly, so the process rate
+limiter and single-flight in query_hf_narrative_generation don't throttle them.
+
+Run from the repository root:  python benchmarks/bench_hf_client.py
+"""
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hf_utils import HF_CONNECT_TIMEOUT, HF_READ_TIMEOUT, get_http_session  # noqa: E402
+from tests.hf_stub_server import start_stub_server  # noqa: E402
+
+CALLS = 500
+
+
+PAYLOAD = {'inputs': 'bench', 'parameters': {'max_new_tokens': 75}}
+
+
+def bench_bare_post(url):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        response = requests.post(url, headers={'Authorization': 'Bearer x'}, json=PAYLOAD, timeout=30)
+        response.raise_for_status()
+        response.json()
+    return (time.perf_counter() - start) / CALLS
+
+
+def bench_pooled(url):
+    session = get_http_session()
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        response = session.post(url, headers={'Authorization': 'Bearer x'}, json=PAYLOAD,
+                                timeout=(HF_CONNECT_TIMEOUT, HF_READ_TIMEOUT))
+        response.raise_for_status()
+        response.json()
+    return (time.perf_counter() - start) / CALLS
+
+
+def main():
+    server, url = start_stub_server()
+    try:
+        get_http_session()
+        bare = bench_bare_post(url)
+        pooled = bench_pooled(url)
+    finally:
+        server.shutdown()
+
+    print(f'{CALLS} calls against {url}')
+    print(f'  bare requests.post : {bare * 1000:.3f} ms/call')
+    print(f'  pooled session     : {pooled * 1000:.3f} ms/call')
+    print(f'  saved per call     : {(bare - pooled) * 1000:.3f} ms ({bare / pooled:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Compares the Galvanize editor's browser payload and rerun time with the whole roster vs one page.
+
+The roster is synthetic and held in st.cache_data, so the rerun time is the
+cost of serializing and rendering the editor, not of building or querying
+the data. A keyset page query is an index range scan of ROSTER_PAGE_SIZE rows,
+so it stays flat as the table grows.
+
+Run from the repository root:  python benchmarks/bench_roster_paging.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from galvanize_utils import ROSTER_PAGE_SIZE  # noqa: E402
+
+ROSTER_SIZES = (1000, 10000, 50000, 100000)
+RERUNS = 5
+
+
+def build_roster(rows):
+    import pandas as pd
+
+    return pd.DataFrame({
+        'student_id': range(1, rows + 1),
+        'course': ['SDI', 'DDI', 'CDI', 'MDI'] * (rows // 4),
+        'cohort': [str(i % 40) for i in range(rows)],
+        'first_name': [f'First{i}' for i in range(rows)],
+        'last_name': [f'Last{i:06d}' for i in range(rows)],
+        'status': ['Applying', 'In-Progress', 'Graduated', 'Applying', 'Graduated'] * (rows // 5),
+        'in_utilization': [i % 3 == 0 for i in range(rows)],
+        'version': [1] * rows
+    })
+
+
+def editor_app(rows, page_size):
+    import streamlit as st
+    from benchmarks.bench_roster_paging import build_roster
+
+    @st.cache_data
+    def roster(n):
+        return build_roster(n)
+
+    df = roster(rows)
+    if page_size:
+        df = df.iloc[:page_size]
+    st.data_editor(df, key='roster_editor', num_rows='dynamic',
+                   column_config={'student_id': None, 'version': None})
+
+
+def rerun_seconds(rows, page_size):
+    at = AppTest.from_function(editor_app, args=(rows, page_size), default_timeout=120)
+    at.run()
+    start = time.perf_counter()
+    for _ in range(RERUNS):
+        at.run()
+    return (time.perf_counter() - start) / RERUNS
+
+
+def main():
+    print(f'Editor payload and rerun time, whole roster vs {ROSTER_PAGE_SIZE}-row page')
+    print(f"{'rows':>8} | {'full payload':>12} | {'page payload':>12} | {'full rerun':>10} | {'page rerun':>10}")
+    for rows in ROSTER_SIZES:
+        roster = build_roster(rows)
+        full_bytes = len(convert_pandas_df_to_arrow_bytes(roster))
+        page_bytes = len(convert_pandas_df_to_arrow_bytes(roster.iloc[:ROSTER_PAGE_SIZE]))
+        full_rerun = rerun_seconds(rows, None)
+        page_rerun = rerun_seconds(rows, ROSTER_PAGE_SIZE)
+        print(f'{rows:>8} | {full_bytes / 1024:>9.0f} KB | {page_bytes / 1024:>9.1f} KB | '
+              f'{full_rerun * 1000:>7.0f} ms | {page_rerun * 1000:>7.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
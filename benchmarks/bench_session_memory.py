@@ -0,0 +1,89 @@
+"""Measures per-session memory for project data: private copies vs shared records.
+
+Each simulated session holds the three seed projects the way st.session_state does.
+"copied" gives every session its own deep-copied dict, as the pages did
+before; "shared" points every session at the cached ProjectRecords and only
+copies (copy-on-write) for the EDITING_SHARE of sessions that are editing
+one project.
+
+Run from the repository root:  python benchmarks/bench_session_memory.py
+"""
+import copy
+import datetime
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_utils import DEFAULT_PROJECTS, ProjectRecord, editable_project_data, project_session_keys  # noqa: E402
+from milestones import MilestoneList  # noqa: E402
+
+SESSION_COUNTS = (100, 500, 1000)
+EDITING_SHARE = 0.1
+# Session key of each project's form data, as the Project Input page stores it.
+PROJECT_KEYS = {project_id: project_session_keys(project_id)[0] for project_id in DEFAULT_PROJECTS}
+
+
+def build_records():
+    """Returns one realistically sized record per project."""
+    records = {}
+    for project_id in PROJECT_KEYS:
+        milestones = MilestoneList()
+        for i in range(25):
+            milestones.add(datetime.date(2026, 1, 1) + datetime.timedelta(days=7 * i),
+                           f'{project_id} milestone {i}: deliver the next integration increment')
+        records[project_id] = ProjectRecord.from_data({
+            'project_id': project_id,
+            'update_bullets': '- Shipped the weekly release and closed open review items\n' * 25,
+            'metric_value': 42.0,
+            'metric_delta': 1.5,
+            'milestones': milestones,
+            'risk': 'Staffing for the next phase is not confirmed yet. ' * 8,
+            'update_summary': 'The team shipped the release on schedule and started the next phase. ' * 10,
+            'last_updated': datetime.datetime.now(datetime.timezone.utc)
+        })
+    return records
+
+
+def copied_sessions(records, sessions):
+    return [
+        {key: copy.deepcopy(records[project_id].to_data()) for project_id, key in PROJECT_KEYS.items()}
+        for _ in range(sessions)
+    ]
+
+
+def shared_sessions(records, sessions):
+    states = []
+    editing_every = int(1 / EDITING_SHARE)
+    for i in range(sessions):
+        state = {key: records[project_id] for project_id, key in PROJECT_KEYS.items()}
+        if i % editing_every == 0:
+            editable_project_data(state, PROJECT_KEYS['vortex_main'])['update_summary'] = 'Edited narrative'
+        states.append(state)
+    return states
+
+
+def measure(build, records, sessions):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    states = build(records, sessions)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del states
+    return used
+
+
+def main():
+    records = build_records()
+    print(f'Session memory for three projects ({EDITING_SHARE:.0%} of shared sessions editing one project)')
+    print(f"{'sessions':>8} | {'copied':>10} | {'shared':>10} | {'per session copied/shared':>26}")
+    for sessions in SESSION_COUNTS:
+        copied = measure(copied_sessions, records, sessions)
+        shared = measure(shared_sessions, records, sessions)
+        print(f'{sessions:>8} | {copied / 1024 / 1024:>7.2f} MB | {shared / 1024 / 1024:>7.2f} MB | '
+              f'{copied / sessions / 1024:>10.1f} KB / {shared / sessions / 1024:.1f} KB')
+
+
+if __name__ == '__main__':
+    main()
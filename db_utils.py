@@ -0,0 +1,1057 @@
+import dataclasses
+import datetime
+import json
+import os
+import select
+import threading
+import time
+import traceback
+import uuid
+
+import sqlalchemy
+import streamlit as st
+from milestones import MilestoneList
+
+# Seconds a cached row is trusted before re-checking its last_updated watermark.
+WATERMARK_CHECK_INTERVAL = 5
+
+# Channel the dashboard_data and milestones triggers NOTIFY with the changed project_id.
+CHANGE_CHANNEL = 'dashboard_changes'
+# Longest wait for a notification before the listener checks its connection.
+LISTEN_TIMEOUT = 30
+# Longest wait before reconnecting after the listener loses its connection.
+LISTEN_MAX_BACKOFF = 60
+
+# Projects are rows in the projects registry table. These seed it the first
+# time it is created: project_id -> (name, icon, summary tile title).
+DEFAULT_PROJECTS = {
+    'platform_main': ('Platform', '🖥️', '🚀 Launch Initiatives'),
+    'vortex_main': ('Vortex', '🌀', '🚀 Launch Initiatives'),
+    'ghostmachine_main': ('GhostMachine', '👻', '🚀 Project Updates')
+}
+# Seconds the registry is cached before the projects table is re-read.
+PROJECT_REGISTRY_TTL = 60
+
+# Window of the metric trend drawn on the Dashboard; windows longer than
+# TREND_WEEKLY_MAX_DAYS are drawn from the monthly rollup instead of the weekly one.
+TREND_DAYS = 90
+TREND_WEEKLY_MAX_DAYS = 180
+
+# dashboard_history is partitioned by month. Partitions older than the retention
+# window are detached and kept as archive tables, or dropped when set to 'drop'.
+HISTORY_RETENTION_MONTHS = 24
+HISTORY_RETENTION_ACTION = 'archive'
+
+# Rollup tables keyed by date_trunc() grain.
+HISTORY_ROLLUPS = {
+    'week': 'dashboard_history_weekly',
+    'month': 'dashboard_history_monthly'
+}
+# Seconds between incremental rollup refreshes in one process.
+ROLLUP_REFRESH_INTERVAL = 60
+# History rows younger than this are left for the next refresh, so a save whose
+# transaction commits after a later history_id is not skipped by the watermark.
+ROLLUP_SETTLE_SECONDS = 60
+
+# dashboard_data columns written by the input forms, besides project_id and last_updated.
+# metric_delta is derived from dashboard_history on save.
+ROW_FIELDS = ('update_bullets', 'metric_value', 'risk', 'update_summary')
+
+
+# --- PROJECT RECORD ---
+@dataclasses.dataclass(frozen=True, slots=True)
+class ProjectRecord:
+    """Read-only view of one project's dashboard_data row.
+
+    Records in the shared cache are referenced by every session that shows
+    the project; a session only gets its own dict from to_data() once the
+    user starts editing.
+    """
+    project_id: str
+    update_bullets: str = ''
+    metric_value: float = 0.0
+    metric_delta: float = 0.0
+    # Milestone objects in date order.
+    milestones: tuple = ()
+    risk: str = ''
+    update_summary: str = ''
+    last_updated: datetime.datetime | None = None
+
+    @classmethod
+    def from_data(cls, data):
+        """Builds a record from a session-style project dict."""
+        if isinstance(data, ProjectRecord):
+            return data
+        milestones = data.get('milestones') or ()
+        if not isinstance(milestones, (MilestoneList, tuple)):
+            milestones = MilestoneList.from_records(milestones)
+        return cls(
+            project_id=data['project_id'],
+            update_bullets=data.get('update_bullets') or '',
+            metric_value=float(data.get('metric_value') or 0.0),
+            metric_delta=float(data.get('metric_delta') or 0.0),
+            milestones=tuple(milestones),
+            risk=data.get('risk') or '',
+            update_summary=data.get('update_summary') or '',
+            last_updated=data.get('last_updated')
+        )
+
+    def get(self, field, default=None):
+        """Dict-style read, so pages can use a shared record like their session dict."""
+        return getattr(self, field, default)
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def to_data(self):
+        """Returns a private, editable session dict with its own MilestoneList."""
+        data = {field.name: getattr(self, field.name) for field in dataclasses.fields(self)}
+        data['milestones'] = MilestoneList(self.milestones)
+        return data
+
+
+def editable_project_data(state, key):
+    """Returns state[key] as an editable dict, copying a shared record on first write."""
+    data = state[key]
+    if isinstance(data, ProjectRecord):
+        data = state[key] = data.to_data()
+    return data
+
+
+# --- PROJECT REGISTRY ---
+@dataclasses.dataclass(frozen=True, slots=True)
+class ProjectInfo:
+    """One row of the projects registry."""
+    project_id: str
+    name: str
+    icon: str = '📁'
+    summary_title: str = '🚀 Project Updates'
+    sort_order: int = 0
+
+
+def default_projects():
+    """Returns the seed registry, for when the database is unavailable."""
+    return {
+        project_id: ProjectInfo(project_id, name, icon, summary_title, sort_order)
+        for sort_order, (project_id, (name, icon, summary_title)) in enumerate(DEFAULT_PROJECTS.items())
+    }
+
+
+@st.cache_resource
+def ensure_projects_table(_conn):
+    """Creates the projects registry once per process and seeds it with DEFAULT_PROJECTS."""
+    with _conn.session as s:
+        s.execute(sqlalchemy.text("""
+            CREATE TABLE IF NOT EXISTS projects (
+                project_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                icon TEXT NOT NULL DEFAULT '📁',
+                summary_title TEXT NOT NULL DEFAULT '🚀 Project Updates',
+                sort_order INTEGER NOT NULL DEFAULT 0,
+                active BOOLEAN NOT NULL DEFAULT true,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            CREATE INDEX IF NOT EXISTS projects_active_order_idx
+                ON projects (sort_order, name) WHERE active;
+        """))
+        s.execute(
+            sqlalchemy.text("""
+                INSERT INTO projects (project_id, name, icon, summary_title, sort_order)
+                VALUES (:project_id, :name, :icon, :summary_title, :sort_order)
+                ON CONFLICT (project_id) DO NOTHING
+            """),
+            [dataclasses.asdict(info) for info in default_projects().values()]
+        )
+        # Saved rows from before the registry existed keep showing up.
+        s.execute(sqlalchemy.text("""
+            INSERT INTO projects (project_id, name, sort_order)
+            SELECT project_id, project_id, 1000 FROM dashboard_data
+            ON CONFLICT (project_id) DO NOTHING
+        """))
+        s.commit()
+    return True
+
+
+@st.cache_resource(ttl=PROJECT_REGISTRY_TTL)
+def load_projects(_conn):
+    """Returns {project_id: ProjectInfo} for every active project, in display order.
+
+    Shared by every session; register_project clears it so a new project
+    shows up without waiting for the TTL in this process.
+    """
+    ensure_projects_table(_conn)
+    with _conn.session as s:
+        rows = s.execute(sqlalchemy.text("""
+            SELECT project_id, name, icon, summary_title, sort_order
+            FROM projects
+            WHERE active
+            ORDER BY sort_order, name
+        """)).mappings().all()
+    return {row['project_id']: ProjectInfo(**row) for row in rows}
+
+
+def register_project(conn, project_id, name, icon='📁', summary_title='🚀 Project Updates', sort_order=0):
+    """Adds a project to the registry, or updates and reactivates an existing one."""
+    ensure_projects_table(conn)
+    with conn.session as s:
+        s.execute(
+            sqlalchemy.text("""
+                INSERT INTO projects (project_id, name, icon, summary_title, sort_order)
+                VALUES (:project_id, :name, :icon, :summary_title, :sort_order)
+                ON CONFLICT (project_id) DO UPDATE SET
+                    name = EXCLUDED.name,
+                    icon = EXCLUDED.icon,
+                    summary_title = EXCLUDED.summary_title,
+                    sort_order = EXCLUDED.sort_order,
+                    active = true
+            """),
+            {'project_id': project_id, 'name': name, 'icon': icon,
+             'summary_title': summary_title, 'sort_order': sort_order}
+        )
+        s.commit()
+    load_projects.clear()
+
+
+def project_session_keys(project_id):
+    """Returns the session_state keys holding a project's form data and its load snapshot."""
+    return f'{project_id}_data', f'{project_id}_snapshot'
+
+
+# --- PROJECT DATA CACHE ---
+class ProjectDataCache:
+    """Process-wide cache of immutable ProjectRecords keyed by project_id.
+
+    While a ChangeListener is connected it sets `listening`, and cached rows
+    stay valid until a notification invalidates them instead of being
+    re-checked every check_interval.
+    """
+
+    def __init__(self, check_interval=WATERMARK_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.listening = False
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, project_id):
+        """Returns (record, last_updated, needs_check) or None when not cached."""
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is None:
+                return None
+            record, last_updated, checked_at = entry
+            needs_check = not self.listening and time.monotonic() - checked_at >= self.check_interval
+            return record, last_updated, needs_check
+
+    def put(self, record):
+        with self._lock:
+            self._entries[record.project_id] = (record, record.last_updated, time.monotonic())
+
+    def touch(self, project_id):
+        """Marks a cached row as freshly validated against the database."""
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is not None:
+                self._entries[project_id] = (entry[0], entry[1], time.monotonic())
+
+    def update(self, project_id, fn, expected_last_updated):
+        """Replaces a cached record with fn(record), e.g. to mirror a milestone write.
+
+        Only a record still at expected_last_updated is updated; an older one
+        is dropped instead, so the write can't be layered onto stale data.
+        """
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is None:
+                return
+            if entry[1] != expected_last_updated:
+                del self._entries[project_id]
+                return
+            record = fn(entry[0])
+            self._entries[project_id] = (record, record.last_updated, entry[2])
+
+    def invalidate(self, project_id=None):
+        with self._lock:
+            if project_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(project_id, None)
+
+
+@st.cache_resource
+def get_project_cache():
+    """Returns the ProjectDataCache shared by every session in this process."""
+    return ProjectDataCache()
+
+
+@st.cache_resource(ttl=WATERMARK_CHECK_INTERVAL)
+def load_watermarks(_conn):
+    """Returns {project_id: last_updated} for every saved project.
+
+    Shared by every session in the process and re-read at most once per
+    WATERMARK_CHECK_INTERVAL, so open dashboards cost one tiny query per
+    interval however many tabs are polling.
+    """
+    with _conn.session as s:
+        rows = s.execute(sqlalchemy.text("SELECT project_id, last_updated FROM dashboard_data")).all()
+    return dict(rows)
+
+
+def sync_watermarks(conn, project_ids=None):
+    """Drops cached rows whose watermark moved and returns their project IDs.
+
+    Rows whose watermark still matches are marked as validated, so the next
+    load serves them from the cache instead of re-reading them.
+    """
+    watermarks = load_watermarks(conn)
+    cache = get_project_cache()
+    moved = []
+    for project_id in project_ids or load_projects(conn):
+        cached = cache.get(project_id)
+        if cached is None:
+            continue
+        if cached[1] != watermarks.get(project_id):
+            cache.invalidate(project_id)
+            moved.append(project_id)
+        else:
+            cache.touch(project_id)
+    return moved
+
+
+# --- CHANGE FEED ---
+@st.cache_resource
+def ensure_change_feed(_conn):
+    """Installs triggers that NOTIFY CHANGE_CHANNEL with the project_id of every changed row."""
+    ensure_milestones_table(_conn)
+    with _conn.session as s:
+        s.execute(sqlalchemy.text(f"""
+            CREATE OR REPLACE FUNCTION dashboard_notify_change() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM pg_notify('{CHANGE_CHANNEL}', OLD.project_id);
+                ELSE
+                    PERFORM pg_notify('{CHANGE_CHANNEL}', NEW.project_id);
+                END IF;
+                RETURN NULL;
+            END
+            $$;
+
+            DROP TRIGGER IF EXISTS dashboard_data_notify ON dashboard_data;
+            CREATE TRIGGER dashboard_data_notify AFTER INSERT OR UPDATE OR DELETE ON dashboard_data
+                FOR EACH ROW EXECUTE FUNCTION dashboard_notify_change();
+            DROP TRIGGER IF EXISTS milestones_notify ON milestones;
+            CREATE TRIGGER milestones_notify AFTER INSERT OR UPDATE OR DELETE ON milestones
+                FOR EACH ROW EXECUTE FUNCTION dashboard_notify_change();
+        """))
+        s.commit()
+    return True
+
+
+class ChangeListener:
+    """Background thread that LISTENs on CHANGE_CHANNEL for the whole process.
+
+    Each notification drops the project's row from the shared cache and bumps
+    its version counter, which open Dashboard sessions compare against the
+    version they last drew. Postgres delivers identical notifications from one
+    transaction only once, so a burst of writes costs one refresh.
+    """
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._lock = threading.Lock()
+        self._versions = {}
+        self.connected = False
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        # Written to by stop() to wake the thread out of select().
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name='dashboard-change-listener', daemon=True)
+        self._thread.start()
+
+    def wait_connected(self, timeout):
+        """Waits up to timeout seconds for the first LISTEN; returns whether it is connected."""
+        self._ready.wait(timeout)
+        return self.connected
+
+    def stop(self, timeout=5):
+        """Stops the thread and closes its connection; the listener can't be restarted."""
+        self._stopped.set()
+        os.write(self._wake_w, b'x')
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+
+    def version(self, project_id):
+        with self._lock:
+            return self._versions.get(project_id, 0)
+
+    def _notify(self, project_id):
+        get_project_cache().invalidate(project_id)
+        with self._lock:
+            self._versions[project_id] = self._versions.get(project_id, 0) + 1
+
+    def _listen(self):
+        # A dedicated connection taken out of the pool, so it never goes back in LISTENing.
+        raw = self._engine.raw_connection()
+        # Read before detach(), which clears the fairy's reference to it.
+        pg_conn = raw.driver_connection
+        raw.detach()
+        try:
+            pg_conn.autocommit = True
+            with pg_conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANGE_CHANNEL}')
+            self.connected = True
+            self._ready.set()
+            # Anything may have changed while disconnected.
+            get_project_cache().invalidate()
+            get_project_cache().listening = True
+            while not self._stopped.is_set():
+                readable, _, _ = select.select([pg_conn, self._wake_r], [], [], LISTEN_TIMEOUT)
+                if self._wake_r in readable:
+                    return
+                if readable:
+                    pg_conn.poll()
+                else:
+                    # Idle: make sure the connection is still alive. Notifications
+                    # read along with the reply are queued like any others.
+                    with pg_conn.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                while pg_conn.notifies:
+                    self._notify(pg_conn.notifies.pop(0).payload)
+        finally:
+            get_project_cache().listening = False
+            self.connected = False
+            pg_conn.close()
+
+    def _run(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            try:
+                self._listen()
+            except Exception:
+                traceback.print_exc()
+            if time.monotonic() - started > LISTEN_MAX_BACKOFF:
+                backoff = 1
+            if self._stopped.wait(backoff):
+                break
+            backoff = min(backoff * 2, LISTEN_MAX_BACKOFF)
+
+
+@st.cache_resource
+def get_change_listener(_conn):
+    """Returns the process's ChangeListener, installing the triggers and starting it on first use."""
+    ensure_change_feed(_conn)
+    listener = ChangeListener(_conn.engine)
+    listener.wait_connected(timeout=2)
+    return listener
+
+
+# --- SERIALIZATION HELPERS ---
+def _parse_milestones(milestones):
+    if milestones is None or milestones == {}:
+        return MilestoneList()
+    if isinstance(milestones, str):
+        try:
+            milestones = json.loads(milestones)
+        except json.JSONDecodeError:
+            return MilestoneList()
+    return MilestoneList.from_records(milestones)
+
+
+def default_project_data(project_id):
+    """Returns an empty record for a project with no saved row."""
+    return ProjectRecord(project_id=project_id)
+
+
+def _row_to_record(row, project_id):
+    # Projects without a dashboard_data row come back as NULL columns.
+    project_data = {k: v for k, v in dict(row).items() if v is not None}
+    project_data['milestones'] = _parse_milestones(project_data.get('milestones'))
+    project_data['project_id'] = project_id
+    return ProjectRecord.from_data(project_data)
+
+
+# --- MILESTONES TABLE ---
+@st.cache_resource
+def ensure_milestones_table(_conn):
+    """Creates the milestones table once per process and moves any legacy JSON milestones into it."""
+    with _conn.session as s:
+        s.execute(sqlalchemy.text("""
+            CREATE TABLE IF NOT EXISTS milestones (
+                project_id TEXT NOT NULL,
+                milestone_id TEXT NOT NULL,
+                milestone_date DATE NOT NULL,
+                description TEXT NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (project_id, milestone_id)
+            );
+            CREATE INDEX IF NOT EXISTS milestones_project_date_idx
+                ON milestones (project_id, milestone_date);
+        """))
+        # dashboard_data.milestones used to hold the whole list as one JSON blob.
+        s.execute(sqlalchemy.text("""
+            INSERT INTO milestones (project_id, milestone_id, milestone_date, description)
+            SELECT
+                d.project_id,
+                coalesce(m.value->>'id', md5(d.project_id || m.ordinality::text || m.value::text)),
+                (m.value->>'date')::date,
+                coalesce(m.value->>'desc', '')
+            FROM dashboard_data d
+            CROSS JOIN LATERAL jsonb_array_elements(
+                CASE WHEN jsonb_typeof(d.milestones::text::jsonb) = 'array'
+                     THEN d.milestones::text::jsonb ELSE '[]'::jsonb END
+            ) WITH ORDINALITY AS m(value, ordinality)
+            WHERE d.milestones IS NOT NULL
+            ON CONFLICT DO NOTHING;
+
+            UPDATE dashboard_data SET milestones = '[]'
+            WHERE milestones IS NOT NULL AND milestones::text <> '[]';
+        """))
+        s.commit()
+    return True
+
+
+def _bump_watermark(session, project_id):
+    """Moves a project's last_updated after a milestone write.
+
+    Creates the project's dashboard_data row if it has none, so every write
+    moves a watermark other processes can see. Returns (previous, current)
+    last_updated, previous being None when the row was just created.
+    """
+    row = session.execute(
+        sqlalchemy.text("""
+            WITH previous AS (
+                SELECT last_updated FROM dashboard_data
+                WHERE project_id = :pid FOR UPDATE
+            )
+            INSERT INTO dashboard_data (project_id, last_updated) VALUES (:pid, now())
+            ON CONFLICT (project_id) DO UPDATE SET last_updated = now()
+            RETURNING (SELECT last_updated FROM previous), last_updated
+        """),
+        {'pid': project_id}
+    ).one()
+    return tuple(row)
+
+
+def _with_milestone(record, milestone_date, desc, milestone_id, last_updated):
+    milestones = MilestoneList(record.milestones)
+    milestones.add(milestone_date, desc, milestone_id)
+    return dataclasses.replace(record, milestones=tuple(milestones), last_updated=last_updated)
+
+
+def add_milestone(conn, project_id, milestone_date, desc):
+    """Inserts one milestone row right away, moves the project's watermark and returns the ID."""
+    ensure_milestones_table(conn)
+    milestone_id = uuid.uuid4().hex
+    with conn.session as s:
+        s.execute(
+            sqlalchemy.text("""
+                INSERT INTO milestones (project_id, milestone_id, milestone_date, description)
+                VALUES (:pid, :mid, :mdate, :mdesc)
+            """),
+            {'pid': project_id, 'mid': milestone_id, 'mdate': milestone_date, 'mdesc': desc}
+        )
+        previous, current = _bump_watermark(s, project_id)
+        s.commit()
+    get_project_cache().update(
+        project_id,
+        lambda record: _with_milestone(record, milestone_date, desc, milestone_id, current),
+        previous
+    )
+    return milestone_id
+
+
+def remove_milestone(conn, project_id, milestone_id):
+    """Deletes one milestone row right away and moves the project's watermark."""
+    ensure_milestones_table(conn)
+    with conn.session as s:
+        s.execute(
+            sqlalchemy.text("DELETE FROM milestones WHERE project_id = :pid AND milestone_id = :mid"),
+            {'pid': project_id, 'mid': milestone_id}
+        )
+        previous, current = _bump_watermark(s, project_id)
+        s.commit()
+    get_project_cache().update(
+        project_id,
+        lambda record: dataclasses.replace(
+            record,
+            milestones=tuple(m for m in record.milestones if m.milestone_id != milestone_id),
+            last_updated=current
+        ),
+        previous
+    )
+
+
+# --- UPDATE HISTORY ---
+def _month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month):
+    return f'dashboard_history_p{month:%Y%m}'
+
+
+def _create_month_partitions(session, first_month, last_month):
+    month = first_month
+    while month <= last_month:
+        session.execute(sqlalchemy.text(f"""
+            CREATE TABLE IF NOT EXISTS {_partition_name(month)}
+            PARTITION OF dashboard_history
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')
+        """))
+        month = _add_months(month, 1)
+
+
+@st.cache_resource
+def ensure_history_table(_conn):
+    """Creates the append-only, month-partitioned dashboard_history table once per process.
+
+    An unpartitioned dashboard_history from before partitioning is copied into
+    the new table and its sequence carried over. A brand-new table is seeded
+    with each project's current dashboard_data row, so the first save after
+    deploy has a previous metric value to compute its delta from.
+    """
+    with _conn.session as s:
+        relkind = s.execute(sqlalchemy.text(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass('dashboard_history')"
+        )).scalar()
+        if relkind == 'r':
+            s.execute(sqlalchemy.text("""
+                ALTER TABLE dashboard_history RENAME TO dashboard_history_unpartitioned;
+                ALTER INDEX IF EXISTS dashboard_history_project_time_idx
+                    RENAME TO dashboard_history_unpartitioned_project_time_idx;
+            """))
+
+        s.execute(sqlalchemy.text("""
+            CREATE TABLE IF NOT EXISTS dashboard_history (
+                history_id BIGSERIAL,
+                project_id TEXT NOT NULL,
+                update_bullets TEXT,
+                metric_value DOUBLE PRECISION,
+                risk TEXT,
+                update_summary TEXT,
+                last_updated TIMESTAMPTZ NOT NULL,
+                PRIMARY KEY (history_id, last_updated)
+            ) PARTITION BY RANGE (last_updated);
+            CREATE INDEX IF NOT EXISTS dashboard_history_project_time_idx
+                ON dashboard_history (project_id, last_updated);
+            CREATE TABLE IF NOT EXISTS history_rollup_watermarks (
+                rollup TEXT PRIMARY KEY,
+                last_history_id BIGINT NOT NULL
+            );
+        """))
+        for table in HISTORY_ROLLUPS.values():
+            s.execute(sqlalchemy.text(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    project_id TEXT NOT NULL,
+                    period_start DATE NOT NULL,
+                    samples INTEGER NOT NULL,
+                    metric_sum DOUBLE PRECISION NOT NULL,
+                    metric_min DOUBLE PRECISION,
+                    metric_max DOUBLE PRECISION,
+                    metric_last DOUBLE PRECISION,
+                    last_at TIMESTAMPTZ NOT NULL,
+                    PRIMARY KEY (project_id, period_start)
+                )
+            """))
+
+        today = datetime.date.today()
+        first_month = _month_start(today)
+        if relkind == 'r':
+            oldest = s.execute(sqlalchemy.text(
+                "SELECT min(last_updated) FROM dashboard_history_unpartitioned"
+            )).scalar()
+            if oldest is not None:
+                first_month = min(first_month, _month_start(oldest))
+        elif relkind is None:
+            oldest = s.execute(sqlalchemy.text(
+                "SELECT min(last_updated) FROM dashboard_data"
+            )).scalar()
+            if oldest is not None:
+                first_month = min(first_month, _month_start(oldest))
+        _create_month_partitions(s, first_month, _add_months(_month_start(today), 1))
+        # Catches rows outside every monthly range (e.g. clock skew) instead of failing the save.
+        s.execute(sqlalchemy.text(
+            "CREATE TABLE IF NOT EXISTS dashboard_history_default PARTITION OF dashboard_history DEFAULT"
+        ))
+
+        if relkind == 'r':
+            s.execute(sqlalchemy.text("""
+                INSERT INTO dashboard_history
+                SELECT history_id, project_id, update_bullets, metric_value, risk, update_summary, last_updated
+                FROM dashboard_history_unpartitioned;
+                SELECT setval(
+                    pg_get_serial_sequence('dashboard_history', 'history_id'),
+                    greatest((SELECT max(history_id) FROM dashboard_history), 1)
+                );
+                DROP TABLE dashboard_history_unpartitioned;
+            """))
+        elif relkind is None:
+            s.execute(sqlalchemy.text("""
+                INSERT INTO dashboard_history (project_id, update_bullets, metric_value, risk, update_summary, last_updated)
+                SELECT project_id, update_bullets, metric_value, risk, update_summary, coalesce(last_updated, now())
+                FROM dashboard_data
+            """))
+        s.commit()
+    return True
+
+
+@st.cache_resource
+def maintain_history(_conn, month):
+    """Runs once per process per calendar month: creates the next partition and applies retention.
+
+    Rollups are brought up to date first so expired rows are already
+    aggregated before their partition is detached or dropped.
+    """
+    ensure_history_table(_conn)
+    refresh_history_rollups(_conn)
+    cutoff = _add_months(month, -HISTORY_RETENTION_MONTHS)
+    with _conn.session as s:
+        _create_month_partitions(s, month, _add_months(month, 1))
+        partitions = s.execute(sqlalchemy.text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'dashboard_history'::regclass
+              AND c.relname ~ '^dashboard_history_p[0-9]{6}$'
+        """)).scalars().all()
+        for name in partitions:
+            partition_month = datetime.date(int(name[-6:-2]), int(name[-2:]), 1)
+            if _add_months(partition_month, 1) > cutoff:
+                continue
+            s.execute(sqlalchemy.text(f"ALTER TABLE dashboard_history DETACH PARTITION {name}"))
+            if HISTORY_RETENTION_ACTION == 'drop':
+                s.execute(sqlalchemy.text(f"DROP TABLE {name}"))
+            else:
+                s.execute(sqlalchemy.text(
+                    f"ALTER TABLE {name} RENAME TO dashboard_history_archive_{name[-6:]}"
+                ))
+        s.commit()
+    return True
+
+
+def _refresh_rollup(session, grain, table):
+    # Folds history rows past the watermark into the rollup and advances the
+    # watermark in the same statement.
+    session.execute(
+        sqlalchemy.text(f"""
+            WITH bounds AS (
+                SELECT
+                    w.lo,
+                    coalesce((
+                        SELECT max(history_id) FROM dashboard_history
+                        WHERE history_id > w.lo
+                          AND last_updated < now() - make_interval(secs => :settle)
+                    ), w.lo) AS hi
+                FROM (
+                    SELECT coalesce(
+                        (SELECT last_history_id FROM history_rollup_watermarks WHERE rollup = :rollup), 0
+                    ) AS lo
+                ) w
+            ),
+            fresh AS (
+                SELECT
+                    h.project_id,
+                    date_trunc(:grain, h.last_updated)::date AS period_start,
+                    count(*) AS samples,
+                    coalesce(sum(h.metric_value), 0) AS metric_sum,
+                    min(h.metric_value) AS metric_min,
+                    max(h.metric_value) AS metric_max,
+                    (array_agg(h.metric_value ORDER BY h.last_updated DESC, h.history_id DESC))[1] AS metric_last,
+                    max(h.last_updated) AS last_at
+                FROM dashboard_history h, bounds b
+                WHERE h.history_id > b.lo AND h.history_id <= b.hi
+                GROUP BY 1, 2
+            ),
+            merged AS (
+                INSERT INTO {table} AS r (
+                    project_id, period_start, samples, metric_sum, metric_min, metric_max, metric_last, last_at
+                )
+                SELECT * FROM fresh
+                ON CONFLICT (project_id, period_start) DO UPDATE SET
+                    samples = r.samples + EXCLUDED.samples,
+                    metric_sum = r.metric_sum + EXCLUDED.metric_sum,
+                    metric_min = least(r.metric_min, EXCLUDED.metric_min),
+                    metric_max = greatest(r.metric_max, EXCLUDED.metric_max),
+                    metric_last = CASE WHEN EXCLUDED.last_at >= r.last_at
+                                       THEN EXCLUDED.metric_last ELSE r.metric_last END,
+                    last_at = greatest(r.last_at, EXCLUDED.last_at)
+            )
+            INSERT INTO history_rollup_watermarks (rollup, last_history_id)
+            SELECT :rollup, hi FROM bounds
+            ON CONFLICT (rollup) DO UPDATE SET last_history_id = EXCLUDED.last_history_id
+        """),
+        {'grain': grain, 'rollup': table, 'settle': ROLLUP_SETTLE_SECONDS}
+    )
+
+
+@st.cache_resource(ttl=ROLLUP_REFRESH_INTERVAL)
+def refresh_history_rollups(_conn):
+    """Incrementally refreshes every rollup table, at most once per ROLLUP_REFRESH_INTERVAL per process."""
+    ensure_history_table(_conn)
+    with _conn.session as s:
+        # Serializes refreshes across processes so no batch is counted twice.
+        s.execute(sqlalchemy.text("SELECT pg_advisory_xact_lock(hashtext('dashboard_history_rollups'))"))
+        for grain, table in HISTORY_ROLLUPS.items():
+            _refresh_rollup(s, grain, table)
+        s.commit()
+    return True
+
+
+def append_history(session, project_ids):
+    """Appends the current dashboard_data rows to dashboard_history inside an open session."""
+    session.execute(
+        sqlalchemy.text("""
+            INSERT INTO dashboard_history (project_id, update_bullets, metric_value, risk, update_summary, last_updated)
+            SELECT project_id, update_bullets, metric_value, risk, update_summary, last_updated
+            FROM dashboard_data
+            WHERE project_id = ANY(:ids)
+        """),
+        {'ids': list(project_ids)}
+    )
+
+
+# Sets metric_delta to the change from the previous history entry; only the
+# two newest rows are read, via the (project_id, last_updated) index.
+_REFRESH_DELTA_SQL = """
+    UPDATE dashboard_data d
+    SET metric_delta = coalesce(latest.delta, 0)
+    FROM (
+        SELECT metric_value - lag(metric_value) OVER (ORDER BY last_updated, history_id) AS delta
+        FROM (
+            SELECT metric_value, last_updated, history_id
+            FROM dashboard_history
+            WHERE project_id = :pid
+            ORDER BY last_updated DESC, history_id DESC
+            LIMIT 2
+        ) recent
+        ORDER BY last_updated DESC, history_id DESC
+        LIMIT 1
+    ) latest
+    WHERE d.project_id = :pid
+    RETURNING d.metric_delta
+"""
+
+
+def load_metric_trends(conn, project_ids=None, days=TREND_DAYS):
+    """Returns {project_id: [average metric_value per period, ...]} for the last `days` days.
+
+    Reads the weekly rollup, or the monthly one for long windows, so the cost
+    depends on the window rather than on how much history has piled up.
+    """
+    refresh_history_rollups(conn)
+    project_ids = list(project_ids or load_projects(conn))
+    table = HISTORY_ROLLUPS['week' if days <= TREND_WEEKLY_MAX_DAYS else 'month']
+    start = datetime.date.today() - datetime.timedelta(days=days)
+    with conn.session as s:
+        rows = s.execute(
+            sqlalchemy.text(f"""
+                SELECT project_id, metric_sum / samples AS metric_value
+                FROM {table}
+                WHERE project_id = ANY(:ids) AND period_start >= :start AND samples > 0
+                ORDER BY project_id, period_start
+            """),
+            {'ids': project_ids, 'start': start}
+        ).all()
+
+    trends = {project_id: [] for project_id in project_ids}
+    for project_id, metric_value in rows:
+        trends[project_id].append(float(metric_value))
+    return trends
+
+
+# --- LOAD / SAVE ---
+# One row per requested project; milestones are aggregated from their table
+# in date order through the (project_id, milestone_date) index.
+_PROJECT_ROWS_SQL = """
+    SELECT
+        p.project_id, d.update_bullets, d.metric_value, d.metric_delta,
+        coalesce((
+            SELECT json_agg(
+                json_build_object('id', m.milestone_id, 'date', m.milestone_date, 'desc', m.description)
+                ORDER BY m.milestone_date
+            )
+            FROM milestones m
+            WHERE m.project_id = p.project_id
+        ), '[]'::json) AS milestones,
+        d.risk, d.update_summary, d.last_updated
+    FROM unnest(CAST(:ids AS text[])) AS p(project_id)
+    LEFT JOIN dashboard_data d ON d.project_id = p.project_id
+"""
+
+
+def load_project_data(conn, project_id):
+    """Returns a project's shared ProjectRecord, served from the cache when fresh.
+
+    The record is shared with other sessions; use editable_project_data
+    before changing anything.
+    """
+    ensure_milestones_table(conn)
+    cache = get_project_cache()
+    cached = cache.get(project_id)
+
+    with conn.session as s:
+        if cached is not None:
+            record, last_updated, needs_check = cached
+            if not needs_check:
+                return record
+
+            watermark = s.execute(
+                sqlalchemy.text("SELECT last_updated FROM dashboard_data WHERE project_id = :proj_id"),
+                {'proj_id': project_id}
+            ).scalar()
+            if watermark == last_updated:
+                cache.touch(project_id)
+                return record
+
+        row = s.execute(
+            sqlalchemy.text(_PROJECT_ROWS_SQL),
+            {'ids': [project_id]}
+        ).mappings().first()
+
+    record = _row_to_record(row, project_id)
+    cache.put(record)
+    return record
+
+
+def load_all_projects(conn, project_ids=None):
+    """Returns {project_id: ProjectRecord} for every project using at most two queries.
+
+    Cached rows due a check are validated together with one watermark query,
+    like load_project_data does for a single project. Rows that are missing or
+    whose watermark moved are fetched together with project_id = ANY(:ids)
+    semantics via unnest, milestones included.
+    """
+    project_ids = list(project_ids or load_projects(conn))
+    cache = get_project_cache()
+    records = {}
+    to_check = {}
+    to_fetch = []
+
+    for project_id in project_ids:
+        cached = cache.get(project_id)
+        if cached is None:
+            to_fetch.append(project_id)
+        elif cached[2]:
+            to_check[project_id] = cached
+        else:
+            records[project_id] = cached[0]
+
+    if not to_check and not to_fetch:
+        return records
+
+    ensure_milestones_table(conn)
+    with conn.session as s:
+        if to_check:
+            watermarks = dict(s.execute(
+                sqlalchemy.text("SELECT project_id, last_updated FROM dashboard_data WHERE project_id = ANY(:ids)"),
+                {'ids': list(to_check)}
+            ).all())
+            for project_id, (record, last_updated, _) in to_check.items():
+                if watermarks.get(project_id) == last_updated:
+                    cache.touch(project_id)
+                    records[project_id] = record
+                else:
+                    to_fetch.append(project_id)
+
+        if to_fetch:
+            rows = s.execute(
+                sqlalchemy.text(_PROJECT_ROWS_SQL),
+                {'ids': to_fetch}
+            ).mappings().all()
+            for row in rows:
+                record = _row_to_record(row, row['project_id'])
+                cache.put(record)
+                records[row['project_id']] = record
+
+    return records
+
+
+def _comparable(field, value):
+    # NUMERIC columns load as Decimal while the form returns floats.
+    if field in ('metric_value', 'metric_delta'):
+        return float(value or 0.0)
+    return value or ''
+
+
+def dirty_fields(current_data, snapshot):
+    """Returns the ROW_FIELDS whose values differ from the last-loaded snapshot."""
+    if snapshot is None:
+        return list(ROW_FIELDS)
+    return [
+        field for field in ROW_FIELDS
+        if _comparable(field, current_data.get(field)) != _comparable(field, snapshot.get(field))
+    ]
+
+
+def save_project_data(conn, current_data, snapshot=None):
+    """Writes a project's changed columns and refreshes its entry in the shared cache.
+
+    With a snapshot of the row as last loaded, only dirty columns are sent in an
+    UPDATE and nothing is written when no field changed. Without one, or when
+    the row does not exist yet, the whole row is upserted. Every write appends
+    the row to dashboard_history, and a metric_value change recomputes
+    metric_delta from it. Returns the list of fields written. Milestones are not
+    part of the row; add_milestone and remove_milestone write them, so the
+    cached record is re-read after the write rather than built from the
+    session's possibly older milestone list.
+    """
+    project_id = current_data['project_id']
+    fields = dirty_fields(current_data, snapshot)
+    if not fields:
+        return []
+
+    ensure_milestones_table(conn)
+    maintain_history(conn, _month_start(current_data['last_updated']))
+    params = {field: current_data[field] for field in fields}
+    params.update({'pid': project_id, 'ts': current_data['last_updated']})
+    with conn.session as s:
+        try:
+            written = 0
+            if snapshot is not None and snapshot.get('last_updated') is not None:
+                # Column names come from ROW_FIELDS, never from user input.
+                assignments = ', '.join(f'{field} = :{field}' for field in fields)
+                written = s.execute(
+                    sqlalchemy.text(f"""
+                        UPDATE dashboard_data SET {assignments}, last_updated = :ts
+                        WHERE project_id = :pid
+                    """),
+                    params
+                ).rowcount
+            if not written:
+                fields = list(ROW_FIELDS)
+                params.update({field: current_data[field] for field in fields})
+                s.execute(sqlalchemy.text("""
+                    INSERT INTO dashboard_data (
+                        project_id, update_bullets, metric_value, risk, update_summary, last_updated
+                    ) VALUES (
+                        :pid, :update_bullets, :metric_value, :risk, :update_summary, :ts
+                    )
+                    ON CONFLICT (project_id) DO UPDATE SET
+                        update_bullets = EXCLUDED.update_bullets,
+                        metric_value = EXCLUDED.metric_value,
+                        risk = EXCLUDED.risk,
+                        update_summary = EXCLUDED.update_summary,
+                        last_updated = EXCLUDED.last_updated;
+                """), params)
+            append_history(s, [project_id])
+            if 'metric_value' in fields:
+                s.execute(sqlalchemy.text(_REFRESH_DELTA_SQL), {'pid': project_id})
+            row = s.execute(
+                sqlalchemy.text(_PROJECT_ROWS_SQL),
+                {'ids': [project_id]}
+            ).mappings().first()
+            s.commit()
+        except Exception:
+            get_project_cache().invalidate(project_id)
+            raise
+
+    get_project_cache().put(_row_to_record(row, project_id))
+    return fields
@@ -0,0 +1,430 @@
+import csv
+import io
+
+import pandas as pd
+import sqlalchemy
+import streamlit as st
+
+# Columns of a roster row as entered on the Galvanize page and in import files.
+STUDENT_COLUMNS = ('course', 'cohort', 'first_name', 'last_name', 'status', 'in_utilization')
+# One student per course cohort; imports and edits upsert on this key.
+STUDENT_KEY = ('course', 'cohort', 'first_name', 'last_name')
+DEFAULT_STATUS = 'Applying'
+
+# Students shown per roster editor page.
+ROSTER_PAGE_SIZE = 100
+# Sort order of roster pages; the trailing student_id makes it a unique keyset.
+ROSTER_ORDER = ('course', 'cohort', 'last_name', 'first_name', 'student_id')
+
+# Rows sent to COPY per buffer, so large files never sit in memory as one CSV string.
+COPY_CHUNK_ROWS = 10000
+
+_TRUE_VALUES = ('true', 't', 'yes', 'y', '1', 'x')
+_FALSE_VALUES = ('false', 'f', 'no', 'n', '0', '')
+
+
+# --- TABLE ---
+@st.cache_resource
+def ensure_students_table(_conn):
+    """Creates the galvanize_students table once per process."""
+    with _conn.session as s:
+        s.execute(sqlalchemy.text("""
+            CREATE TABLE IF NOT EXISTS galvanize_students (
+                student_id BIGSERIAL PRIMARY KEY,
+                course TEXT NOT NULL,
+                cohort TEXT NOT NULL,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'Applying',
+                in_utilization BOOLEAN NOT NULL DEFAULT false,
+                -- Bumped on every change, for optimistic concurrency checks.
+                version INTEGER NOT NULL DEFAULT 1,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                UNIQUE (course, cohort, first_name, last_name)
+            );
+            CREATE INDEX IF NOT EXISTS galvanize_students_page_idx
+                ON galvanize_students (course, cohort, last_name, first_name, student_id);
+        """))
+        _ensure_status_counts(s)
+        s.commit()
+    return True
+
+
+def _ensure_status_counts(session):
+    # galvanize_status_counts holds students per (course, status) and how many
+    # of them are in utilization, and galvanize_cohort_counts students per
+    # (course, cohort) for the filter options. Statement-level triggers fold
+    # each write's transition tables into both, so one COPY import is one
+    # aggregate update.
+    has_triggers = session.execute(sqlalchemy.text("""
+        SELECT count(*) = 3 AND to_regclass('galvanize_cohort_counts') IS NOT NULL FROM pg_trigger
+        WHERE tgrelid = 'galvanize_students'::regclass AND tgname LIKE 'galvanize_status_counts_%'
+    """)).scalar()
+    if has_triggers:
+        return
+
+    session.execute(sqlalchemy.text("""
+        CREATE TABLE IF NOT EXISTS galvanize_status_counts (
+            course TEXT NOT NULL,
+            status TEXT NOT NULL,
+            students INTEGER NOT NULL,
+            utilized INTEGER NOT NULL,
+            PRIMARY KEY (course, status)
+        );
+
+        CREATE TABLE IF NOT EXISTS galvanize_cohort_counts (
+            course TEXT NOT NULL,
+            cohort TEXT NOT NULL,
+            students INTEGER NOT NULL,
+            PRIMARY KEY (course, cohort)
+        );
+
+        CREATE OR REPLACE FUNCTION galvanize_status_counts_apply() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO galvanize_status_counts AS c (course, status, students, utilized)
+                SELECT course, status, -count(*), -count(*) FILTER (WHERE in_utilization)
+                FROM old_rows GROUP BY course, status
+                ON CONFLICT (course, status) DO UPDATE SET
+                    students = c.students + EXCLUDED.students,
+                    utilized = c.utilized + EXCLUDED.utilized;
+                INSERT INTO galvanize_cohort_counts AS c (course, cohort, students)
+                SELECT course, cohort, -count(*)
+                FROM old_rows GROUP BY course, cohort
+                ON CONFLICT (course, cohort) DO UPDATE SET
+                    students = c.students + EXCLUDED.students;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO galvanize_status_counts AS c (course, status, students, utilized)
+                SELECT course, status, count(*), count(*) FILTER (WHERE in_utilization)
+                FROM new_rows GROUP BY course, status
+                ON CONFLICT (course, status) DO UPDATE SET
+                    students = c.students + EXCLUDED.students,
+                    utilized = c.utilized + EXCLUDED.utilized;
+                INSERT INTO galvanize_cohort_counts AS c (course, cohort, students)
+                SELECT course, cohort, count(*)
+                FROM new_rows GROUP BY course, cohort
+                ON CONFLICT (course, cohort) DO UPDATE SET
+                    students = c.students + EXCLUDED.students;
+            END IF;
+            DELETE FROM galvanize_status_counts WHERE students <= 0;
+            DELETE FROM galvanize_cohort_counts WHERE students <= 0;
+            RETURN NULL;
+        END
+        $$;
+
+        -- Transition tables allow only one event per trigger.
+        DROP TRIGGER IF EXISTS galvanize_status_counts_insert ON galvanize_students;
+        DROP TRIGGER IF EXISTS galvanize_status_counts_update ON galvanize_students;
+        DROP TRIGGER IF EXISTS galvanize_status_counts_delete ON galvanize_students;
+        CREATE TRIGGER galvanize_status_counts_insert AFTER INSERT ON galvanize_students
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION galvanize_status_counts_apply();
+        CREATE TRIGGER galvanize_status_counts_update AFTER UPDATE ON galvanize_students
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION galvanize_status_counts_apply();
+        CREATE TRIGGER galvanize_status_counts_delete AFTER DELETE ON galvanize_students
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION galvanize_status_counts_apply();
+
+        -- Rebuild from the roster once, with writers blocked until the triggers are live.
+        LOCK TABLE galvanize_students IN SHARE ROW EXCLUSIVE MODE;
+        TRUNCATE galvanize_status_counts;
+        INSERT INTO galvanize_status_counts (course, status, students, utilized)
+        SELECT course, status, count(*), count(*) FILTER (WHERE in_utilization)
+        FROM galvanize_students GROUP BY course, status;
+        TRUNCATE galvanize_cohort_counts;
+        INSERT INTO galvanize_cohort_counts (course, cohort, students)
+        SELECT course, cohort, count(*)
+        FROM galvanize_students GROUP BY course, cohort;
+    """))
+
+
+def load_status_counts(conn):
+    """Returns the precomputed course x status counts as a DataFrame with course, status, count and utilized."""
+    ensure_students_table(conn)
+    with conn.session as s:
+        result = s.execute(sqlalchemy.text("""
+            SELECT course, status, students AS count, utilized
+            FROM galvanize_status_counts
+            ORDER BY course, status
+        """))
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def load_students_page(conn, course=None, cohort=None, status=None, after=None, page_size=ROSTER_PAGE_SIZE):
+    """Returns (page_df, next_key) for one page of the filtered roster.
+
+    Pages are keyset-paginated on ROSTER_ORDER: `after` is the key of the last
+    row of the previous page (None for the first page), so every page costs one
+    index range scan however deep it is. next_key is None on the last page.
+    """
+    ensure_students_table(conn)
+    after = after or (None,) * len(ROSTER_ORDER)
+    with conn.session as s:
+        result = s.execute(
+            sqlalchemy.text("""
+                SELECT student_id, course, cohort, first_name, last_name, status, in_utilization, version
+                FROM galvanize_students
+                WHERE (CAST(:course AS text) IS NULL OR course = :course)
+                  AND (CAST(:cohort AS text) IS NULL OR cohort = :cohort)
+                  AND (CAST(:status AS text) IS NULL OR status = :status)
+                  AND (CAST(:after_id AS bigint) IS NULL
+                       OR (course, cohort, last_name, first_name, student_id)
+                          > (:after_course, :after_cohort, :after_last, :after_first, :after_id))
+                ORDER BY course, cohort, last_name, first_name, student_id
+                LIMIT :limit
+            """),
+            {
+                'course': course, 'cohort': cohort, 'status': status,
+                'after_course': after[0], 'after_cohort': after[1], 'after_last': after[2],
+                'after_first': after[3], 'after_id': after[4],
+                # One extra row tells whether another page follows.
+                'limit': page_size + 1
+            }
+        )
+        page = pd.DataFrame(result.all(), columns=list(result.keys()))
+
+    if len(page) <= page_size:
+        return page, None
+    page = page.iloc[:page_size]
+    last = page.iloc[-1]
+    return page, (last['course'], last['cohort'], last['last_name'], last['first_name'], int(last['student_id']))
+
+
+def load_roster_filter_options(conn, course=None):
+    """Returns (courses, cohorts, statuses) for the roster filters; cohorts are limited to `course`.
+
+    Read from the trigger-maintained summary tables, so the cost does not
+    grow with the roster.
+    """
+    ensure_students_table(conn)
+    with conn.session as s:
+        counts = s.execute(sqlalchemy.text(
+            "SELECT DISTINCT course, status FROM galvanize_status_counts"
+        )).all()
+        cohorts = s.execute(
+            sqlalchemy.text("""
+                SELECT DISTINCT cohort FROM galvanize_cohort_counts
+                WHERE CAST(:course AS text) IS NULL OR course = :course
+                ORDER BY cohort
+            """),
+            {'course': course}
+        ).scalars().all()
+    courses = sorted({row[0] for row in counts})
+    statuses = sorted({row[1] for row in counts})
+    return courses, cohorts, statuses
+
+
+# --- IMPORT ---
+def read_roster_file(uploaded_file):
+    """Reads an uploaded CSV or Parquet roster into a DataFrame of strings and booleans."""
+    name = getattr(uploaded_file, 'name', '').lower()
+    if name.endswith('.parquet'):
+        # pandas needs pyarrow (or fastparquet) installed to read Parquet.
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file, dtype=str, keep_default_na=False)
+
+
+def validate_roster(df):
+    """Splits a roster into (valid_rows, rejected_rows) without looping over rows.
+
+    Column names are normalized, text is trimmed, a blank status becomes
+    DEFAULT_STATUS and in_utilization accepts common yes/no spellings.
+    Rejected rows keep their original values plus an 'error' column. When a
+    key appears more than once in the file, the last row wins.
+    """
+    df = df.rename(columns=lambda c: str(c).strip().lower().replace(' ', '_'))
+    missing = [c for c in STUDENT_KEY if c not in df.columns]
+    if missing:
+        raise ValueError(f"Roster is missing required column(s): {', '.join(missing)}")
+
+    rows = pd.DataFrame(index=df.index)
+    for column in STUDENT_COLUMNS[:-1]:
+        values = df[column] if column in df.columns else pd.Series('', index=df.index)
+        rows[column] = values.fillna('').astype(str).str.strip()
+    rows['status'] = rows['status'].mask(rows['status'] == '', DEFAULT_STATUS)
+
+    if 'in_utilization' in df.columns:
+        utilization = df['in_utilization'].fillna('').astype(str).str.strip().str.lower()
+    else:
+        utilization = pd.Series('', index=df.index)
+    is_true = utilization.isin(_TRUE_VALUES)
+    bad_utilization = ~(is_true | utilization.isin(_FALSE_VALUES))
+    rows['in_utilization'] = is_true
+
+    error = pd.Series('', index=df.index)
+    for column in STUDENT_KEY:
+        error = error.mask((rows[column] == '') & (error == ''), f'{column} is required')
+    error = error.mask(bad_utilization & (error == ''), 'in_utilization must be yes/no')
+
+    rejected = df[error != ''].assign(error=error[error != ''])
+    valid = rows[error == ''].drop_duplicates(subset=list(STUDENT_KEY), keep='last')
+    return valid.reset_index(drop=True), rejected.reset_index(drop=True)
+
+
+def _copy_rows(cursor, table, df):
+    columns = ', '.join(STUDENT_COLUMNS)
+    for start in range(0, len(df), COPY_CHUNK_ROWS):
+        buffer = io.StringIO()
+        df.iloc[start:start + COPY_CHUNK_ROWS].to_csv(
+            buffer, columns=list(STUDENT_COLUMNS), header=False, index=False, quoting=csv.QUOTE_MINIMAL
+        )
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def import_roster(conn, df):
+    """Upserts validated roster rows with COPY into a staging table, then one INSERT ... ON CONFLICT.
+
+    Returns {'inserted': n, 'updated': n}; rows identical to what is stored
+    are left untouched and counted in neither.
+    """
+    ensure_students_table(conn)
+    if df.empty:
+        return {'inserted': 0, 'updated': 0}
+
+    raw = conn.engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE galvanize_students_stage (
+                    course TEXT, cohort TEXT, first_name TEXT, last_name TEXT,
+                    status TEXT, in_utilization BOOLEAN
+                ) ON COMMIT DROP
+            """)
+            _copy_rows(cursor, 'galvanize_students_stage', df)
+            cursor.execute("""
+                INSERT INTO galvanize_students AS g (
+                    course, cohort, first_name, last_name, status, in_utilization
+                )
+                SELECT course, cohort, first_name, last_name, status, in_utilization
+                FROM galvanize_students_stage
+                ON CONFLICT (course, cohort, first_name, last_name) DO UPDATE SET
+                    status = EXCLUDED.status,
+                    in_utilization = EXCLUDED.in_utilization,
+                    version = g.version + 1,
+                    updated_at = now()
+                WHERE (g.status, g.in_utilization) IS DISTINCT FROM (EXCLUDED.status, EXCLUDED.in_utilization)
+                RETURNING (xmax = 0) AS inserted
+            """)
+            flags = [row[0] for row in cursor.fetchall()]
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    inserted = sum(flags)
+    return {'inserted': inserted, 'updated': len(flags) - inserted}
+
+
+# --- EDITOR DELTAS ---
+class RosterConflict(Exception):
+    """Raised when rows changed in the database since the editor loaded them."""
+
+    def __init__(self, student_ids):
+        self.student_ids = student_ids
+        super().__init__(f'{len(student_ids)} row(s) were changed by someone else since the roster was loaded.')
+
+
+def roster_changes(base_df, editor_state):
+    """Turns st.data_editor's edited/added/deleted rows into (updates, inserts, deletes) DataFrames.
+
+    base_df is the frame the editor was given, with student_id and version
+    columns; row positions in editor_state refer to it. Updates and inserts
+    are validated like imported rows and invalid ones raise ValueError.
+    """
+    edited = editor_state.get('edited_rows', {})
+    positions = [int(position) for position in edited]
+    updates = base_df.iloc[positions].copy()
+    for changes, index in zip(edited.values(), updates.index):
+        for column, value in changes.items():
+            updates.at[index, column] = value
+
+    inserts = pd.DataFrame(
+        [row for row in editor_state.get('added_rows', []) if row],
+        columns=list(STUDENT_COLUMNS)
+    )
+    deletes = base_df.iloc[editor_state.get('deleted_rows', [])][['student_id', 'version']]
+
+    valid_updates, rejected_updates = validate_roster(updates[list(STUDENT_COLUMNS)])
+    valid_inserts, rejected_inserts = validate_roster(inserts)
+    rejected = pd.concat([rejected_updates, rejected_inserts])
+    if not rejected.empty:
+        raise ValueError('; '.join(sorted(set(rejected['error']))))
+    if len(valid_updates) != len(updates):
+        raise ValueError('Two edited rows have the same course, cohort and name')
+    # validate_roster resets the index; reattach the row identity.
+    valid_updates[['student_id', 'version']] = updates[['student_id', 'version']].to_numpy()
+    return valid_updates, valid_inserts, deletes
+
+
+def apply_roster_changes(conn, updates, inserts, deletes):
+    """Applies editor deltas in one transaction, one statement per kind of change.
+
+    Updates and deletes only match rows whose version is still the one the
+    editor loaded; if any row fails that check nothing is written and
+    RosterConflict lists the stale student_ids. Returns
+    {'updated': n, 'inserted': n, 'deleted': n}.
+    """
+    ensure_students_table(conn)
+    with conn.session as s:
+        try:
+            updated = s.execute(
+                sqlalchemy.text("""
+                    UPDATE galvanize_students AS g SET
+                        course = u.course, cohort = u.cohort,
+                        first_name = u.first_name, last_name = u.last_name,
+                        status = u.status, in_utilization = u.in_utilization,
+                        version = g.version + 1, updated_at = now()
+                    FROM unnest(
+                        CAST(:ids AS bigint[]), CAST(:versions AS integer[]),
+                        CAST(:course AS text[]), CAST(:cohort AS text[]),
+                        CAST(:first_name AS text[]), CAST(:last_name AS text[]),
+                        CAST(:status AS text[]), CAST(:in_utilization AS boolean[])
+                    ) AS u(student_id, version, course, cohort, first_name, last_name, status, in_utilization)
+                    WHERE g.student_id = u.student_id AND g.version = u.version
+                    RETURNING g.student_id
+                """),
+                {
+                    'ids': updates['student_id'].astype(int).tolist(),
+                    'versions': updates['version'].astype(int).tolist(),
+                    **{column: updates[column].tolist() for column in STUDENT_COLUMNS}
+                }
+            ).scalars().all() if not updates.empty else []
+
+            deleted = s.execute(
+                sqlalchemy.text("""
+                    DELETE FROM galvanize_students AS g
+                    USING unnest(CAST(:ids AS bigint[]), CAST(:versions AS integer[])) AS d(student_id, version)
+                    WHERE g.student_id = d.student_id AND g.version = d.version
+                    RETURNING g.student_id
+                """),
+                {
+                    'ids': deletes['student_id'].astype(int).tolist(),
+                    'versions': deletes['version'].astype(int).tolist()
+                }
+            ).scalars().all() if not deletes.empty else []
+
+            stale = (set(updates['student_id'].astype(int)) - set(updated)) | \
+                    (set(deletes['student_id'].astype(int)) - set(deleted))
+            if stale:
+                raise RosterConflict(sorted(stale))
+
+            if not inserts.empty:
+                s.execute(
+                    sqlalchemy.text("""
+                        INSERT INTO galvanize_students (course, cohort, first_name, last_name, status, in_utilization)
+                        VALUES (:course, :cohort, :first_name, :last_name, :status, :in_utilization)
+                    """),
+                    inserts[list(STUDENT_COLUMNS)].to_dict('records')
+                )
+            s.commit()
+        except Exception:
+            s.rollback()
+            raise
+
+    return {'updated': len(updated), 'inserted': len(inserts), 'deleted': len(deleted)}
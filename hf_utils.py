@@ -1,36 +1,317 @@
+import json
+import os
+import random
+import threading
+import time
+
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+
+
+def get_setting(name, default):
+    """Reads a setting from Streamlit secrets, then the environment."""
+    try:
+        return st.secrets[name]
+    except (KeyError, FileNotFoundError):
+        return os.environ.get(name, default)
+
+
+HF_MODEL_ID = get_setting('HF_MODEL_ID', 'google/flan-t5-base')
+API_URL = get_setting('HF_API_URL', f'https://api-inference.huggingface.co/models/{HF_MODEL_ID}')
+
+GENERATION_PARAMETERS = {
+    "max_new_tokens": 75,
+    "do_sample": True,
+    "temperature": 0.7,
+    "top_p": 0.9,
+}
+
+# --- HTTP CLIENT SETTINGS ---
+HF_POOL_SIZE = int(get_setting('HF_POOL_SIZE', 10))
+HF_CONNECT_TIMEOUT = float(get_setting('HF_CONNECT_TIMEOUT', 5))
+HF_READ_TIMEOUT = float(get_setting('HF_READ_TIMEOUT', 30))
+
+# --- COLD-START RETRY SETTINGS ---
+HF_MAX_RETRIES = int(get_setting('HF_MAX_RETRIES', 3))
+# Longest single wait on a loading model, before jitter.
+HF_MAX_RETRY_WAIT = float(get_setting('HF_MAX_RETRY_WAIT', 20))
+# Wait used when a 503 response does not include estimated_time.
+HF_DEFAULT_RETRY_WAIT = 2.0
+HF_WARM_UP = str(get_setting('HF_WARM_UP', 'true')).lower() == 'true'
+
+# --- RATE LIMIT SETTINGS ---
+# Upstream requests per minute allowed from this process, and the burst on top.
+HF_RATE_LIMIT_PER_MIN = float(get_setting('HF_RATE_LIMIT_PER_MIN', 60))
+HF_RATE_LIMIT_BURST = int(get_setting('HF_RATE_LIMIT_BURST', 10))
+# Seconds a call may queue for a slot before it is rejected.
+HF_RATE_LIMIT_MAX_WAIT = float(get_setting('HF_RATE_LIMIT_MAX_WAIT', 15))
+
+
+@st.cache_resource
+def get_http_session():
+    """Returns the keep-alive HTTP session shared by every session in this process."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HF_POOL_SIZE, pool_maxsize=HF_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# --- RATE LIMITING AND COALESCING ---
+class InferenceStats:
+    """Thread-safe counters for calls made to the Hugging Face API."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'upstream_requests': 0, 'queued': 0, 'coalesced': 0, 'rejected': 0}
+
+    def increment(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+@st.cache_resource
+def get_inference_stats():
+    return InferenceStats()
+
+
+class TokenBucket:
+    """Token-bucket limiter shared by every session in the process."""
+
+    def __init__(self, rate_per_sec, capacity):
+        self.rate_per_sec = rate_per_sec
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait):
+        """Takes one token, waiting up to max_wait seconds. Returns False if none came free."""
+        deadline = time.monotonic() + max_wait
+        queued = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_sec)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate_per_sec
+            if now + wait > deadline:
+                return False
+            if not queued:
+                get_inference_stats().increment('queued')
+                queued = True
+            time.sleep(wait)
+
+
+@st.cache_resource
+def get_rate_limiter():
+    return TokenBucket(HF_RATE_LIMIT_PER_MIN / 60, HF_RATE_LIMIT_BURST)
+
+
+class SharedStream:
+    """Tokens from one upstream stream, replayed to every caller reading it."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._tokens = []
+        self._done = False
+        self._error = None
+
+    def pump(self, tokens):
+        """Reads the upstream generator to the end, publishing each token as it arrives."""
+        try:
+            for text in tokens:
+                with self._cond:
+                    self._tokens.append(text)
+                    self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def __iter__(self):
+        position = 0
+        while True:
+            with self._cond:
+                while position >= len(self._tokens) and not self._done:
+                    self._cond.wait()
+                if position < len(self._tokens):
+                    text = self._tokens[position]
+                    position += 1
+                elif self._error is not None:
+                    raise self._error
+                else:
+                    return
+            yield text
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None}
+                self._calls[key] = call
+        if not leader:
+            get_inference_stats().increment('coalesced')
+            call['done'].wait()
+            return call['result']
+
+        try:
+            call['result'] = fn(*args)
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result']
+
+    def stream(self, key, fn, *args):
+        """Like do() for a token generator: callers joining mid-stream get every token so far, then the rest.
+
+        The upstream generator is read on a background thread, so it is not
+        cut short when the first caller stops reading.
+        """
+        with self._lock:
+            shared = self._streams.get(key)
+            leader = shared is None
+            if leader:
+                shared = self._streams[key] = SharedStream()
+        if leader:
+            threading.Thread(
+                target=self._pump_stream, args=(key, shared, fn, args), daemon=True, name='hf-stream'
+            ).start()
+        else:
+            get_inference_stats().increment('coalesced')
+        return iter(shared)
+
+    def _pump_stream(self, key, shared, fn, args):
+        try:
+            shared.pump(fn(*args))
+        finally:
+            with self._lock:
+                del self._streams[key]
+
+
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight()
+
+
+def model_loading_delay(response_obj):
+    """Returns how long to wait before retrying a 503 "model loading" response, or None."""
+    if response_obj.status_code != 503:
+        return None
+    try:
+        estimated_time = float(response_obj.json().get('estimated_time') or HF_DEFAULT_RETRY_WAIT)
+    except (ValueError, AttributeError, TypeError):
+        estimated_time = HF_DEFAULT_RETRY_WAIT
+    return min(estimated_time, HF_MAX_RETRY_WAIT) * random.uniform(0.9, 1.1)
+
+
+def warm_up_model(api_token, api_url=API_URL):
+    """Sends a tiny request that waits for the model to load, so real requests start warm."""
+    try:
+        get_http_session().post(
+            api_url,
+            headers={"Authorization": f"Bearer {api_token}"},
+            json={"inputs": "ping", "parameters": {"max_new_tokens": 1}, "options": {"wait_for_model": True}},
+            timeout=(HF_CONNECT_TIMEOUT, HF_READ_TIMEOUT * 4)
+        )
+    except requests.exceptions.RequestException:
+        pass
+
+
+@st.cache_resource
+def start_model_warm_up(_api_token):
+    """Starts warm_up_model in the background once per process when HF_WARM_UP is on."""
+    if not (HF_WARM_UP and _api_token):
+        return None
+    thread = threading.Thread(target=warm_up_model, args=(_api_token,), daemon=True, name='hf-warm-up')
+    thread.start()
+    return thread
 
-HF_MODEL_ID = 'google/flan-t5-base'
-API_URL = f'https://api-inference.huggingface.co/models/{HF_MODEL_ID}'
 
 # --- API HELPER FUNCTION ---
-def query_hf_narrative_generation(prompt_text, api_token):
-    """Sends a prompt to Hugging Face API for text generation."""
+def query_hf_narrative_generation(prompt_text, api_token, api_url=API_URL, parameters=None,
+                                  read_timeout=None, max_retries=None, retry_budget=None):
+    """Sends a prompt, or a list of prompts, to Hugging Face API for text generation.
+
+    With a retry_budget, a loading model is only waited for while the
+    suggested wait still fits in that many seconds from the first attempt.
+    """
     if not api_token:
         return {"error": "API Token is missing."}
+    read_timeout = HF_READ_TIMEOUT if read_timeout is None else read_timeout
+    max_retries = HF_MAX_RETRIES if max_retries is None else max_retries
 
     headers = {"Authorization": f"Bearer {api_token}"}
-    response_obj = None
-
     payload = {
-       "inputs": prompt_text,
-        "parameters": {
-            "max_new_tokens": 75,
-            "do_sample": True,
-            "temperature": 0.7,
-            "top_p": 0.9,
-        }
+        "inputs": prompt_text,
+        "parameters": parameters or GENERATION_PARAMETERS
     }
 
+    # Identical requests already in flight share one upstream call.
+    flight_key = json.dumps({"url": api_url, "payload": payload}, sort_keys=True)
+    return get_single_flight().do(
+        flight_key, _post_generation, api_url, headers, payload, read_timeout, max_retries, retry_budget
+    )
+
+
+def _should_retry(response_obj, attempt, max_retries, started, retry_budget):
+    """Returns how long to wait before retrying a loading model, or None to stop."""
+    retry_delay = model_loading_delay(response_obj)
+    if retry_delay is None or attempt == max_retries:
+        return None
+    if retry_budget is not None and time.monotonic() - started + retry_delay > retry_budget:
+        return None
+    return retry_delay
+
+
+def _post_generation(api_url, headers, payload, read_timeout, max_retries, retry_budget=None):
+    response_obj = None
+    started = time.monotonic()
     try:
-        response_obj = requests.post(API_URL, headers=headers, json=payload, timeout=30)
+        # A cold model answers 503 with estimated_time; wait that long and try again.
+        for attempt in range(max_retries + 1):
+            if not get_rate_limiter().acquire(HF_RATE_LIMIT_MAX_WAIT):
+                get_inference_stats().increment('rejected')
+                return {"error": "Too many generation requests right now. Please try again in a moment."}
+            get_inference_stats().increment('upstream_requests')
+            response_obj = get_http_session().post(
+                api_url,
+                headers=headers,
+                json=payload,
+                timeout=(HF_CONNECT_TIMEOUT, read_timeout)
+            )
+            retry_delay = _should_retry(response_obj, attempt, max_retries, started, retry_budget)
+            if retry_delay is None:
+                break
+            time.sleep(retry_delay)
+
         response_obj.raise_for_status()
         return response_obj.json()
 
     # --- ERROR HANDLING ---
     except requests.exceptions.HTTPError as http_err:
-        st.error(f"API Request failed with HTTP Status Code: {http_err.response.status_code}")
         error_details = f"Status Code: {http_err.response.status_code}"
         try:
             error_json = http_err.response.json()
@@ -57,9 +338,92 @@ def query_hf_narrative_generation(prompt_text, api_token):
         return {"error": error_details}
 
     except requests.exceptions.RequestException as req_err:
-        st.error(f"API Request failed: {req_err}")
         return {"error": f"Network or request error: {req_err}"}
 
     except Exception as e:
-        st.error(f"An unexpected error occurred: {e}")
-        return {"error": f"An unexpected programming error occurred: {e}"}
\ No newline at end of file
+        return {"error": f"An unexpected programming error occurred: {e}"}
+
+
+# --- STREAMING HELPER FUNCTION ---
+def stream_hf_narrative_generation(prompt_text, api_token, api_url=API_URL, parameters=None,
+                                   read_timeout=None, max_retries=None, retry_budget=None):
+    """Yields generated text token by token from the API's server-sent-event stream.
+
+    Raises requests.exceptions.RequestException if the request or the stream
+    fails. retry_budget works as in query_hf_narrative_generation.
+    """
+    if not api_token:
+        raise requests.exceptions.RequestException("API Token is missing.")
+    read_timeout = HF_READ_TIMEOUT if read_timeout is None else read_timeout
+    max_retries = HF_MAX_RETRIES if max_retries is None else max_retries
+
+    headers = {"Authorization": f"Bearer {api_token}", "Accept": "text/event-stream"}
+    payload = {
+        "inputs": prompt_text,
+        "parameters": parameters or GENERATION_PARAMETERS,
+        "stream": True
+    }
+
+    # Identical streams already in flight share one upstream call.
+    flight_key = json.dumps({"url": api_url, "payload": payload}, sort_keys=True)
+    yield from get_single_flight().stream(
+        flight_key, _stream_generation, api_url, headers, payload, read_timeout, max_retries, retry_budget
+    )
+
+
+def _stream_generation(api_url, headers, payload, read_timeout, max_retries, retry_budget=None):
+    started = time.monotonic()
+    for attempt in range(max_retries + 1):
+        if not get_rate_limiter().acquire(HF_RATE_LIMIT_MAX_WAIT):
+            get_inference_stats().increment('rejected')
+            raise requests.exceptions.RequestException(
+                "Too many generation requests right now. Please try again in a moment."
+            )
+        get_inference_stats().increment('upstream_requests')
+        response_obj = get_http_session().post(
+            api_url,
+            headers=headers,
+            json=payload,
+            stream=True,
+            timeout=(HF_CONNECT_TIMEOUT, read_timeout)
+        )
+        retry_delay = _should_retry(response_obj, attempt, max_retries, started, retry_budget)
+        if retry_delay is None:
+            break
+        response_obj.close()
+        time.sleep(retry_delay)
+
+    with response_obj:
+        response_obj.raise_for_status()
+        produced_text = False
+        for text in _response_tokens(response_obj):
+            produced_text = True
+            yield text
+    if not produced_text:
+        raise requests.exceptions.RequestException("The API response did not contain any generated text.")
+
+
+def _response_tokens(response_obj):
+    """Yields the text in a generation response, streamed or not."""
+    if response_obj.headers.get("Content-Type", "").startswith("application/json"):
+        # The endpoint ignored "stream": true and answered with the usual JSON body.
+        result = response_obj.json()
+        if isinstance(result, dict) and "error" in result:
+            raise requests.exceptions.RequestException(f"API Error: {result['error']}")
+        if isinstance(result, list) and result:
+            result = result[0]
+        text = result.get("generated_text") if isinstance(result, dict) else None
+        if text:
+            yield text
+        return
+
+    # chunk_size=None hands over each chunk as it arrives instead of waiting to fill a buffer.
+    for line in response_obj.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        event = json.loads(line[len("data:"):])
+        if "error" in event:
+            raise requests.exceptions.RequestException(f"API Error: {event['error']}")
+        token = event.get("token") or {}
+        if token.get("text") and not token.get("special"):
+            yield token["text"]
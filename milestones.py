@@ -0,0 +1,90 @@
+import bisect
+import datetime
+import itertools
+import uuid
+
+
+class Milestone:
+    """One dated milestone with a stable ID."""
+    __slots__ = ('milestone_id', 'date', 'desc', '_seq')
+
+    def __init__(self, milestone_id, date, desc, seq=0):
+        self.milestone_id = milestone_id
+        self.date = date
+        self.desc = desc
+        self._seq = seq
+
+    def __repr__(self):
+        return f'Milestone({self.milestone_id!r}, {self.date!r}, {self.desc!r})'
+
+
+class MilestoneList:
+    """Milestones kept in date order, with O(log n) insertion and O(1) removal by ID.
+
+    Removal only drops the ID from the lookup table; the stale slot in the
+    ordered index is skipped while iterating and compacted away once stale
+    slots outnumber live ones.
+    """
+    __slots__ = ('_order', '_items', '_seq', '_stale')
+
+    def __init__(self, milestones=()):
+        self._order = []
+        self._items = {}
+        self._seq = itertools.count()
+        self._stale = 0
+        for m in milestones:
+            self.add(m.date, m.desc, m.milestone_id)
+
+    @classmethod
+    def from_records(cls, records):
+        """Builds a list from dicts with 'date', 'desc' and optionally 'id'."""
+        milestones = cls()
+        for record in records or ():
+            date_value = record.get('date')
+            if isinstance(date_value, str):
+                date_value = datetime.date.fromisoformat(date_value[:10])
+            milestones.add(date_value, record.get('desc', ''), record.get('id'))
+        return milestones
+
+    def add(self, date, desc, milestone_id=None):
+        """Inserts a milestone in date order and returns it."""
+        milestone_id = milestone_id or uuid.uuid4().hex
+        if milestone_id in self._items:
+            self.remove(milestone_id)
+        milestone = Milestone(milestone_id, date, desc, next(self._seq))
+        self._items[milestone_id] = milestone
+        bisect.insort(self._order, (date, milestone._seq, milestone_id))
+        return milestone
+
+    def remove(self, milestone_id):
+        """Removes a milestone by ID; unknown IDs are ignored."""
+        if self._items.pop(milestone_id, None) is None:
+            return
+        self._stale += 1
+        if self._stale > len(self._items):
+            self._order = [entry for entry in self._order if self._is_live(entry)]
+            self._stale = 0
+
+    def get(self, milestone_id):
+        return self._items.get(milestone_id)
+
+    def _is_live(self, entry):
+        milestone = self._items.get(entry[2])
+        return milestone is not None and milestone._seq == entry[1]
+
+    def __iter__(self):
+        for entry in self._order:
+            if self._is_live(entry):
+                yield self._items[entry[2]]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __contains__(self, milestone_id):
+        return milestone_id in self._items
+
+    def __deepcopy__(self, memo):
+        return MilestoneList(self)
@@ -0,0 +1,171 @@
+import abc
+import re
+
+import requests
+from hf_utils import (
+    API_URL,
+    HF_MODEL_ID,
+    get_setting,
+    query_hf_narrative_generation,
+    stream_hf_narrative_generation
+)
+
+# --- BACKEND SETTINGS ---
+# Comma-separated backend names tried in order, e.g. "hf,local" or "local".
+NARRATIVE_BACKEND = get_setting('NARRATIVE_BACKEND', 'hf,local')
+# Seconds a remote backend may take (to the first token when streaming) before
+# the next backend in the chain is used.
+NARRATIVE_REMOTE_TIMEOUT = float(get_setting('NARRATIVE_REMOTE_TIMEOUT', 10))
+
+# Errors that mean a streaming backend failed and the next one should be tried.
+STREAM_ERRORS = (requests.exceptions.RequestException, RuntimeError, ValueError)
+
+
+class NarrativeBackend(abc.ABC):
+    """Turns a prompt into a narrative.
+
+    generate() returns the same shape as query_hf_narrative_generation:
+    [{'generated_text': ...}] on success or {'error': ...} on failure.
+    """
+    name = 'base'
+    model_id = 'base'
+    # Whether results are worth keeping in the narrative cache.
+    cacheable = True
+    needs_token = False
+
+    @abc.abstractmethod
+    def generate(self, prompt_text, api_token=None):
+        """Returns the narrative for one prompt."""
+
+    def generate_batch(self, prompts, api_token=None):
+        """Returns one generate() result per prompt."""
+        return [self.generate(prompt, api_token) for prompt in prompts]
+
+    def stream(self, prompt_text, api_token=None):
+        """Yields the narrative in pieces; raises on failure."""
+        generation_result = self.generate(prompt_text, api_token)
+        if isinstance(generation_result, dict) and 'error' in generation_result:
+            raise RuntimeError(generation_result['error'])
+        yield generation_result[0]['generated_text']
+
+
+# --- HUGGING FACE BACKEND ---
+class HFInferenceBackend(NarrativeBackend):
+    """Remote generation through the Hugging Face inference API."""
+    name = 'hf'
+    needs_token = True
+
+    def __init__(self, model_id=HF_MODEL_ID, api_url=API_URL, read_timeout=None, max_retries=None,
+                 retry_budget=None):
+        self.model_id = model_id
+        self.api_url = api_url
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+
+    def generate(self, prompt_text, api_token=None):
+        return query_hf_narrative_generation(
+            prompt_text, api_token, api_url=self.api_url,
+            read_timeout=self.read_timeout, max_retries=self.max_retries, retry_budget=self.retry_budget
+        )
+
+    def generate_batch(self, prompts, api_token=None):
+        generation_result = self.generate(prompts, api_token)
+        if not (isinstance(generation_result, list) and len(generation_result) == len(prompts)):
+            return [generation_result] * len(prompts)
+        # Batched pipelines may wrap each prompt's output in its own list.
+        return [item if isinstance(item, list) else [item] for item in generation_result]
+
+    def stream(self, prompt_text, api_token=None):
+        return stream_hf_narrative_generation(
+            prompt_text, api_token, api_url=self.api_url,
+            read_timeout=self.read_timeout, max_retries=self.max_retries, retry_budget=self.retry_budget
+        )
+
+
+# --- LOCAL BACKEND ---
+# Matches prompts written by narrative_utils.build_narrative_prompt and build_chunk_prompt.
+_PROMPT_PATTERN = re.compile(r'^(?P<verb>\w+).*?for the (?P<team>.+?) team\b[^:]*:\s*(?P<bullets>.*)', re.S)
+_BULLET_SPLIT = re.compile(r'\n+|;\s*|(?:^|\s)[-*•]\s+')
+
+
+class LocalSummarizerBackend(NarrativeBackend):
+    """In-process extractive summarizer: no network, answers in microseconds."""
+    name = 'local'
+    model_id = 'local-extractive-v1'
+    cacheable = False
+
+    def __init__(self, max_points=4):
+        self.max_points = max_points
+
+    def generate(self, prompt_text, api_token=None):
+        match = _PROMPT_PATTERN.search(prompt_text)
+        team, bullets = (match['team'], match['bullets']) if match else ('project', prompt_text)
+        is_chunk = bool(match) and match['verb'] == 'Summarize'
+
+        points = [p.strip(' .-*•\t') for p in _BULLET_SPLIT.split(bullets)]
+        points = [p for p in points if p][:self.max_points]
+        if not points:
+            return {'error': 'No update points to summarize.'}
+
+        if is_chunk:
+            # Chunk summaries feed a later pass, so keep them to the points themselves.
+            return [{'generated_text': f'{_join_points(points)}.'}]
+        sentences = [f'Update from the {team} team: {points[0]}.']
+        if len(points) > 1:
+            sentences.append(f'Other highlights: {_join_points(points[1:])}.')
+        return [{'generated_text': ' '.join(sentences)}]
+
+
+def _lower_first(text):
+    # Keep acronyms such as "API" intact.
+    if len(text) > 1 and text[1].isupper():
+        return text
+    return text[:1].lower() + text[1:]
+
+
+def _join_points(points):
+    points = [_lower_first(p) for p in points]
+    if len(points) == 1:
+        return points[0]
+    return f"{', '.join(points[:-1])} and {points[-1]}"
+
+
+# --- BACKEND SELECTION ---
+BACKENDS = {
+    'hf': HFInferenceBackend,
+    'local': LocalSummarizerBackend
+}
+
+
+def get_narrative_backends(setting=None):
+    """Returns the configured fallback chain of backends, primary first.
+
+    Remote backends that have a fallback behind them only wait for a loading
+    model while its estimated_time fits in NARRATIVE_REMOTE_TIMEOUT, and give
+    up on a silent connection after the same time, keeping the form
+    responsive when the inference API is degraded.
+    """
+    names = [n.strip() for n in (setting or NARRATIVE_BACKEND).split(',') if n.strip()]
+    unknown = [n for n in names if n not in BACKENDS]
+    if unknown or not names:
+        raise ValueError(f"Unknown NARRATIVE_BACKEND entries {unknown}; choose from {sorted(BACKENDS)}.")
+
+    chain = []
+    for i, name in enumerate(names):
+        if name == 'hf' and i < len(names) - 1:
+            chain.append(HFInferenceBackend(read_timeout=NARRATIVE_REMOTE_TIMEOUT,
+                                            retry_budget=NARRATIVE_REMOTE_TIMEOUT))
+        else:
+            chain.append(BACKENDS[name]())
+    return chain
+
+
+def backends_need_token(backends=None):
+    """Returns True when no configured backend can generate without an API token."""
+    return all(backend.needs_token for backend in backends or get_narrative_backends())
+
+
+def backends_use_hf(backends=None):
+    """Returns True when the configured chain includes the Hugging Face backend."""
+    return any(isinstance(backend, HFInferenceBackend) for backend in backends or get_narrative_backends())
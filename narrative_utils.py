@@ -0,0 +1,622 @@
+import collections
+import concurrent.futures
+import datetime
+import hashlib
+import json
+import threading
+import time
+import traceback
+import uuid
+
+import sqlalchemy
+import streamlit as st
+from db_utils import append_history, editable_project_data, get_project_cache, load_projects, maintain_history
+from hf_utils import GENERATION_PARAMETERS, HF_MODEL_ID, get_setting
+from narrative_backends import STREAM_ERRORS, get_narrative_backends
+
+# --- CACHE SETTINGS ---
+NARRATIVE_LRU_MAX_BYTES = int(get_setting('NARRATIVE_LRU_MAX_BYTES', 1_000_000))
+NARRATIVE_DB_MAX_BYTES = int(get_setting('NARRATIVE_DB_MAX_BYTES', 50_000_000))
+# Once over budget, the Postgres tier is trimmed to this share of it, so the
+# next few writes don't each trigger another eviction.
+NARRATIVE_DB_EVICT_TO = 0.9
+# Least recently used rows read per eviction pass.
+NARRATIVE_DB_EVICT_BATCH = 100
+
+# --- BACKGROUND JOB SETTINGS ---
+NARRATIVE_WORKERS = int(get_setting('NARRATIVE_WORKERS', 4))
+# Prompts sent per request when generating narratives for every project.
+NARRATIVE_BATCH_SIZE = int(get_setting('NARRATIVE_BATCH_SIZE', 4))
+# Finished jobs nobody collected are dropped after this many seconds.
+NARRATIVE_JOB_TTL = 3600
+# Stream tokens into the page as they are generated instead of waiting for the full text.
+NARRATIVE_STREAMING = str(get_setting('NARRATIVE_STREAMING', 'true')).lower() == 'true'
+
+# --- MAP-REDUCE SETTINGS ---
+# Rough token budget for the bullets in one prompt; longer updates are chunked.
+NARRATIVE_CHUNK_TOKENS = int(get_setting('NARRATIVE_CHUNK_TOKENS', 300))
+# Reduce passes allowed before the chunk summaries are sent as they are.
+NARRATIVE_MAX_REDUCE_DEPTH = 3
+
+
+def build_narrative_prompt(team_name, update_bullets):
+    """Returns the status-update prompt for a team's bullet points."""
+    return f"Write a short narrative for a status update based on these points for the {team_name} team: {update_bullets} "
+
+
+def build_chunk_prompt(team_name, update_bullets):
+    """Returns the prompt that condenses one chunk of a long update."""
+    return f"Summarize these status points for the {team_name} team in one or two sentences: {update_bullets} "
+
+
+def narrative_cache_key(prompt_text, model_id=HF_MODEL_ID, parameters=None):
+    """Hashes everything that determines a generation into a stable cache key."""
+    key_source = json.dumps(
+        {'model': model_id, 'prompt': prompt_text, 'parameters': parameters or GENERATION_PARAMETERS},
+        sort_keys=True
+    )
+    return hashlib.sha256(key_source.encode()).hexdigest()
+
+
+# --- IN-PROCESS LRU TIER ---
+class NarrativeLRU:
+    """Byte-bounded LRU of generated narratives shared by every session."""
+
+    def __init__(self, max_bytes=NARRATIVE_LRU_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        size = len(text.encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.encode())
+            self._entries[key] = text
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.encode())
+
+
+@st.cache_resource
+def get_narrative_lru():
+    return NarrativeLRU()
+
+
+# --- POSTGRES TIER ---
+@st.cache_resource
+def ensure_narrative_cache_table(_conn):
+    """Creates the narrative_cache table once per process."""
+    with _conn.session as s:
+        s.execute(sqlalchemy.text("""
+            CREATE TABLE IF NOT EXISTS narrative_cache (
+                cache_key TEXT PRIMARY KEY,
+                model_id TEXT NOT NULL,
+                narrative TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                last_used_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            CREATE INDEX IF NOT EXISTS narrative_cache_last_used_idx
+                ON narrative_cache (last_used_at);
+        """))
+        _ensure_cache_usage(s)
+        s.commit()
+    return True
+
+
+def _ensure_cache_usage(session):
+    # narrative_cache_usage holds the table's total size_bytes, kept current by
+    # a row trigger, so writes can tell they are over budget without a scan.
+    has_trigger = session.execute(sqlalchemy.text("""
+        SELECT count(*) = 1 FROM pg_trigger
+        WHERE tgrelid = 'narrative_cache'::regclass AND tgname = 'narrative_cache_track_size'
+    """)).scalar()
+    if has_trigger:
+        return
+
+    session.execute(sqlalchemy.text("""
+        CREATE TABLE IF NOT EXISTS narrative_cache_usage (
+            id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+            total_bytes BIGINT NOT NULL
+        );
+
+        CREATE OR REPLACE FUNCTION narrative_cache_track_size() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE narrative_cache_usage SET total_bytes = total_bytes
+                + CASE WHEN TG_OP IN ('INSERT', 'UPDATE') THEN NEW.size_bytes ELSE 0 END
+                - CASE WHEN TG_OP IN ('UPDATE', 'DELETE') THEN OLD.size_bytes ELSE 0 END;
+            RETURN NULL;
+        END
+        $$;
+
+        -- Reads only touch last_used_at, so they don't fire it.
+        DROP TRIGGER IF EXISTS narrative_cache_track_size ON narrative_cache;
+        CREATE TRIGGER narrative_cache_track_size
+            AFTER INSERT OR UPDATE OF size_bytes OR DELETE ON narrative_cache
+            FOR EACH ROW EXECUTE FUNCTION narrative_cache_track_size();
+
+        -- Total the table once, with writers blocked until the trigger is live.
+        LOCK TABLE narrative_cache IN SHARE ROW EXCLUSIVE MODE;
+        INSERT INTO narrative_cache_usage (id, total_bytes)
+        SELECT true, coalesce(sum(size_bytes), 0) FROM narrative_cache
+        ON CONFLICT (id) DO UPDATE SET total_bytes = EXCLUDED.total_bytes;
+    """))
+
+
+def _db_get(conn, key):
+    ensure_narrative_cache_table(conn)
+    with conn.session as s:
+        text = s.execute(
+            sqlalchemy.text("""
+                UPDATE narrative_cache SET last_used_at = now()
+                WHERE cache_key = :key
+                RETURNING narrative
+            """),
+            {'key': key}
+        ).scalar()
+        s.commit()
+    return text
+
+
+def _db_put(conn, key, model_id, text):
+    ensure_narrative_cache_table(conn)
+    with conn.session as s:
+        s.execute(
+            sqlalchemy.text("""
+                INSERT INTO narrative_cache (cache_key, model_id, narrative, size_bytes)
+                VALUES (:key, :model, :text, :size)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    narrative = EXCLUDED.narrative,
+                    size_bytes = EXCLUDED.size_bytes,
+                    last_used_at = now();
+            """),
+            {'key': key, 'model': model_id, 'text': text, 'size': len(text.encode())}
+        )
+        total_bytes = s.execute(sqlalchemy.text("SELECT total_bytes FROM narrative_cache_usage")).scalar()
+        if total_bytes is not None and total_bytes > NARRATIVE_DB_MAX_BYTES:
+            _evict_db_entries(s, total_bytes - int(NARRATIVE_DB_MAX_BYTES * NARRATIVE_DB_EVICT_TO))
+        s.commit()
+
+
+def _evict_db_entries(session, excess_bytes):
+    """Deletes least recently used rows until excess_bytes have been freed.
+
+    Victims are read in last_used_at order through its index, a batch at a
+    time, so only the rows being evicted are visited.
+    """
+    while excess_bytes > 0:
+        freed = session.execute(
+            sqlalchemy.text("""
+                DELETE FROM narrative_cache WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key,
+                               sum(size_bytes) OVER (ORDER BY last_used_at, cache_key) - size_bytes AS freed_before
+                        FROM (
+                            SELECT cache_key, size_bytes, last_used_at FROM narrative_cache
+                            ORDER BY last_used_at
+                            LIMIT :batch
+                        ) oldest
+                    ) ranked
+                    WHERE freed_before < :excess
+                )
+                RETURNING size_bytes
+            """),
+            {'batch': NARRATIVE_DB_EVICT_BATCH, 'excess': excess_bytes}
+        ).scalars().all()
+        if not freed:
+            break
+        excess_bytes -= sum(freed)
+
+
+# --- CACHED GENERATION ---
+def lookup_cached_narrative(key, conn=None):
+    """Returns a cached narrative from the LRU, then Postgres, or None."""
+    lru = get_narrative_lru()
+    text = lru.get(key)
+    if text is None and conn is not None:
+        try:
+            text = _db_get(conn, key)
+        except Exception:
+            traceback.print_exc()
+        if text is not None:
+            lru.put(key, text)
+    return text
+
+
+def store_narrative(key, text, conn=None, model_id=HF_MODEL_ID):
+    get_narrative_lru().put(key, text)
+    if conn is not None:
+        try:
+            _db_put(conn, key, model_id, text)
+        except Exception:
+            traceback.print_exc()
+
+
+def generate_narrative(prompt_text, api_token, conn=None, bypass_cache=False, backends=None):
+    """Returns a narrative for the prompt, reusing a cached generation unless bypassed.
+
+    Backends are tried in order until one succeeds. The return value has the
+    same shape as query_hf_narrative_generation.
+    """
+    errors = []
+    for backend in backends or get_narrative_backends():
+        key = narrative_cache_key(prompt_text, model_id=backend.model_id)
+        if backend.cacheable and not bypass_cache:
+            text = lookup_cached_narrative(key, conn)
+            if text is not None:
+                return [{'generated_text': text}]
+
+        generation_result = backend.generate(prompt_text, api_token)
+        text, error = extract_generated_text(generation_result)
+        if text:
+            if backend.cacheable:
+                store_narrative(key, text, conn, model_id=backend.model_id)
+            return generation_result
+        errors.append(f'{backend.name}: {error}')
+    return {'error': '; '.join(errors)}
+
+
+def stream_narrative(prompt_text, api_token, conn=None, bypass_cache=False, backends=None):
+    """Yields a narrative in pieces as it is generated, caching the full text at the end.
+
+    A backend that fails before producing any text hands over to the next one.
+    """
+    errors = []
+    for backend in backends or get_narrative_backends():
+        key = narrative_cache_key(prompt_text, model_id=backend.model_id)
+        if backend.cacheable and not bypass_cache:
+            text = lookup_cached_narrative(key, conn)
+            if text is not None:
+                yield text
+                return
+
+        tokens = []
+        try:
+            for token in backend.stream(prompt_text, api_token):
+                tokens.append(token)
+                yield token
+        except STREAM_ERRORS as e:
+            if tokens:
+                raise
+            errors.append(f'{backend.name}: {e}')
+            continue
+        if tokens:
+            if backend.cacheable:
+                store_narrative(key, ''.join(tokens), conn, model_id=backend.model_id)
+            return
+        errors.append(f'{backend.name}: the response contained no text')
+    raise RuntimeError('; '.join(errors) or 'No narrative backend produced any text.')
+
+
+def extract_generated_text(generation_result):
+    """Returns (text, error) from a generation result."""
+    if isinstance(generation_result, list) and generation_result:
+        text = generation_result[0].get('generated_text')
+        if text:
+            return text.strip(), None
+    if isinstance(generation_result, dict) and 'error' in generation_result:
+        return None, generation_result['error']
+    return None, f'Unexpected response format: {generation_result}'
+
+
+# --- MAP-REDUCE SUMMARIZATION ---
+def estimate_tokens(text):
+    """Cheap token estimate (about 4 tokens per 3 words) used for chunk budgets."""
+    return (len(text.split()) * 4 + 2) // 3
+
+
+def chunk_bullets(update_bullets, max_tokens=NARRATIVE_CHUNK_TOKENS):
+    """Packs bullet lines into chunks that each fit the token budget.
+
+    A single bullet longer than the budget is split on word boundaries.
+    """
+    max_words = max(1, max_tokens * 3 // 4)
+    chunks = []
+    current, current_tokens = [], 0
+    for line in (l.strip() for l in update_bullets.splitlines()):
+        if not line:
+            continue
+        words = line.split()
+        pieces = [' '.join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append('\n'.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+@st.cache_resource
+def get_chunk_executor():
+    """Returns the thread pool that summarizes chunks of long updates in parallel."""
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=NARRATIVE_WORKERS, thread_name_prefix='narrative-chunk'
+    )
+
+
+def _reduce_input(team_name, update_bullets, api_token, conn=None):
+    """Condenses an over-budget update into chunk summaries until it fits one prompt.
+
+    Chunk summaries go through the narrative cache, so an unchanged chunk is
+    never summarized twice. Returns the text to use for the final prompt.
+    """
+    for _ in range(NARRATIVE_MAX_REDUCE_DEPTH):
+        if estimate_tokens(update_bullets) <= NARRATIVE_CHUNK_TOKENS:
+            break
+        chunks = chunk_bullets(update_bullets)
+        futures = [
+            get_chunk_executor().submit(
+                generate_narrative, build_chunk_prompt(team_name, chunk), api_token, conn=conn
+            )
+            for chunk in chunks
+        ]
+        summaries = []
+        for chunk, future in zip(chunks, futures):
+            text, _ = extract_generated_text(future.result())
+            # A failed chunk keeps its original bullets rather than being dropped.
+            summaries.append(text or chunk)
+        update_bullets = '\n'.join(summaries)
+    return update_bullets
+
+
+def summarize_update(team_name, update_bullets, api_token, conn=None, bypass_cache=False):
+    """Returns a narrative for a team's bullets, map-reducing updates too long for one prompt.
+
+    bypass_cache only applies to the final pass; cached chunk summaries are reused.
+    """
+    reduced = _reduce_input(team_name, update_bullets, api_token, conn)
+    return generate_narrative(build_narrative_prompt(team_name, reduced), api_token,
+                              conn=conn, bypass_cache=bypass_cache)
+
+
+def stream_update_summary(team_name, update_bullets, api_token, conn=None, bypass_cache=False):
+    """Streaming form of summarize_update; only the final pass is streamed."""
+    reduced = _reduce_input(team_name, update_bullets, api_token, conn)
+    yield from stream_narrative(build_narrative_prompt(team_name, reduced), api_token,
+                                conn=conn, bypass_cache=bypass_cache)
+
+
+# --- BACKGROUND JOBS ---
+class NarrativeJobRunner:
+    """Runs narrative generations on a thread pool so page scripts never block on them."""
+
+    def __init__(self, max_workers=NARRATIVE_WORKERS):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='narrative'
+        )
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, fn, *args, progress=None, **kwargs):
+        """Schedules fn and returns a job ID to keep in session state.
+
+        progress is an optional list the job appends partial output to.
+        """
+        job_id = uuid.uuid4().hex
+        future = self._executor.submit(fn, *args, **kwargs)
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = (future, time.monotonic(), progress)
+        return job_id
+
+    def is_done(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job is None or job[0].done()
+
+    def partial_text(self, job_id):
+        """Returns the output a streaming job has produced so far."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job[2] is None:
+            return ''
+        return ''.join(job[2])
+
+    def pop_result(self, job_id):
+        """Removes a finished job and returns its result, or an error dict."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            return {'error': 'Generation job expired before its result was collected.'}
+        try:
+            return job[0].result()
+        except Exception as e:
+            traceback.print_exc()
+            return {'error': f'Generation job failed: {e}'}
+
+    def _prune(self):
+        cutoff = time.monotonic() - NARRATIVE_JOB_TTL
+        expired = [
+            job_id for job_id, (future, submitted_at, _) in self._jobs.items()
+            if future.done() and submitted_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+@st.cache_resource
+def get_job_runner():
+    """Returns the NarrativeJobRunner shared by every session in this process."""
+    return NarrativeJobRunner()
+
+
+def _collect_stream(progress, team_name, update_bullets, api_token, conn=None, bypass_cache=False):
+    for token in stream_update_summary(team_name, update_bullets, api_token, conn=conn, bypass_cache=bypass_cache):
+        progress.append(token)
+    return [{'generated_text': ''.join(progress)}]
+
+
+def submit_narrative_job(team_name, update_bullets, api_token, conn=None, bypass_cache=False,
+                         stream=NARRATIVE_STREAMING):
+    """Starts a narrative generation for a team's bullets in the background and returns its job ID."""
+    runner = get_job_runner()
+    if not stream:
+        return runner.submit(
+            summarize_update, team_name, update_bullets, api_token, conn=conn, bypass_cache=bypass_cache
+        )
+    progress = []
+    return runner.submit(
+        _collect_stream, progress, team_name, update_bullets, api_token,
+        conn=conn, bypass_cache=bypass_cache, progress=progress
+    )
+
+
+def render_narrative_job(job_key, data_key, height=125):
+    """Renders the Generated Update area while a background generation is pending.
+
+    job_key is the session state key holding the job ID and data_key the
+    project's session dict. Streamed tokens appear as they arrive; when the
+    job finishes its narrative moves into update_summary. Only the polling
+    fragment reruns meanwhile, so the rest of the page stays editable.
+    Returns False when there is no pending job, so the caller draws the
+    normal text area.
+    """
+    error_key = f'{job_key}_error'
+    if error_key in st.session_state:
+        st.error(f"Update generation failed: {st.session_state.pop(error_key)}")
+
+    if not st.session_state.get(job_key):
+        return False
+
+    @st.fragment(run_every=0.5)
+    def poll_narrative_job():
+        job_id = st.session_state.get(job_key)
+        runner = get_job_runner()
+        if job_id and not runner.is_done(job_id):
+            st.text_area(
+                'Generated Update',
+                value=runner.partial_text(job_id) or 'Waiting for the model...',
+                height=height,
+                disabled=True
+            )
+            st.caption('✨ Generating in the background. Keep editing; the narrative will be kept when it finishes.')
+            return
+
+        generated_update, error = extract_generated_text(runner.pop_result(job_id))
+        st.session_state.pop(job_key, None)
+        if generated_update:
+            editable_project_data(st.session_state, data_key)['update_summary'] = generated_update
+            st.toast('Update generated!')
+        else:
+            st.session_state[error_key] = error
+        st.rerun()
+
+    poll_narrative_job()
+    return True
+
+
+# --- BATCH GENERATION ---
+def _generate_batch(prompts, api_token, conn=None):
+    """Generates prompts with the primary backend's batch call, one by one through the chain if that fails."""
+    backend = get_narrative_backends()[0]
+    results = []
+    for prompt, generation_result in zip(prompts, backend.generate_batch(prompts, api_token)):
+        text, error = extract_generated_text(generation_result)
+        if text:
+            if backend.cacheable:
+                store_narrative(narrative_cache_key(prompt, model_id=backend.model_id), text, conn,
+                                model_id=backend.model_id)
+        else:
+            text, error = extract_generated_text(generate_narrative(prompt, api_token, conn=conn))
+        results.append((text, error))
+    return results
+
+
+def generate_all_narratives(conn, api_token, batch_size=NARRATIVE_BATCH_SIZE, max_workers=NARRATIVE_WORKERS):
+    """Regenerates update_summary for every registered project with bullets and saves them together.
+
+    Batches run concurrently on a bounded pool, so wall-clock time is roughly
+    one slow call. Returns {project_id: error} for projects that failed.
+    """
+    with conn.session as s:
+        rows = s.execute(sqlalchemy.text("""
+            SELECT project_id, update_bullets
+            FROM dashboard_data
+            WHERE coalesce(update_bullets, '') <> ''
+        """)).mappings().all()
+
+    projects = load_projects(conn)
+    primary = get_narrative_backends()[0]
+    summaries = {}
+    errors = {}
+    pending = []
+    long_updates = []
+    for row in rows:
+        if row['project_id'] not in projects:
+            # Retired from the registry.
+            continue
+        team_name = projects[row['project_id']].name
+        if estimate_tokens(row['update_bullets']) > NARRATIVE_CHUNK_TOKENS:
+            long_updates.append((row['project_id'], team_name, row['update_bullets']))
+            continue
+        prompt = build_narrative_prompt(team_name, row['update_bullets'])
+        key = narrative_cache_key(prompt, model_id=primary.model_id)
+        text = lookup_cached_narrative(key, conn) if primary.cacheable else None
+        if text is not None:
+            summaries[row['project_id']] = text.strip()
+        else:
+            pending.append((row['project_id'], prompt))
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_generate_batch, [prompt for _, prompt in batch], api_token, conn):
+                [project_id for project_id, _ in batch]
+            for batch in batches
+        }
+        # Long updates are map-reduced on their own instead of joining a list-input batch.
+        for project_id, team_name, update_bullets in long_updates:
+            future = executor.submit(
+                lambda *args: [extract_generated_text(summarize_update(*args, conn=conn))],
+                team_name, update_bullets, api_token
+            )
+            futures[future] = [project_id]
+
+        for future in concurrent.futures.as_completed(futures):
+            project_ids = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [(None, f'Generation failed: {e}')] * len(project_ids)
+            for project_id, (text, error) in zip(project_ids, results):
+                if text:
+                    summaries[project_id] = text
+                else:
+                    errors[project_id] = error
+
+    if summaries:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        maintain_history(conn, now.date().replace(day=1))
+        with conn.session as s:
+            s.execute(
+                sqlalchemy.text("""
+                    UPDATE dashboard_data
+                    SET update_summary = :summary, last_updated = :ts
+                    WHERE project_id = :pid
+                """),
+                [{'pid': pid, 'summary': text, 'ts': now} for pid, text in summaries.items()]
+            )
+            append_history(s, summaries)
+            s.commit()
+        for project_id in summaries:
+            get_project_cache().invalidate(project_id)
+
+    return errors
@@ -0,0 +1,303 @@
+import streamlit as st
+import datetime
+import re
+from hf_utils import get_setting, start_model_warm_up
+from milestones import MilestoneList
+from narrative_backends import backends_need_token, backends_use_hf
+from narrative_utils import render_narrative_job, submit_narrative_job
+from db_utils import (
+    add_milestone,
+    default_project_data,
+    editable_project_data,
+    load_project_data,
+    load_projects,
+    project_session_keys,
+    register_project,
+    remove_milestone,
+    save_project_data
+)
+
+st.set_page_config(page_title='Project Input', layout='centered')
+
+# --- DATABASE CONNECTION ---
+DB_URL = get_setting("DATABASE_URL", None)
+if not DB_URL:
+    st.error("🚨 DATABASE_URL not found in Streamlit Secrets or the environment! Cannot connect to database.")
+    st.stop()
+
+try:
+    conn = st.connection('postgres', type='sql', url=DB_URL)
+    projects = load_projects(conn)
+except Exception as e:
+    st.error(f"🚨 Failed to connect to the database: {e}")
+    st.stop()
+
+
+# --- API CONNECTION ---
+HF_API_TOKEN = get_setting('HUGGINGFACE_API_TOKEN', None)
+if not HF_API_TOKEN and backends_need_token():
+    st.error('Hugging Face API Token not found')
+
+# Start loading the model now so the first generation doesn't pay the cold start.
+if backends_use_hf():
+    start_model_warm_up(HF_API_TOKEN)
+
+
+# --- PROJECT SELECTION ---
+# ?project=<project_id> links straight to a project's form.
+requested_project = st.query_params.get('project')
+if 'input_project' not in st.session_state and requested_project in projects:
+    st.session_state['input_project'] = requested_project
+
+if not projects:
+    st.info('No projects are registered yet. Register one below.')
+else:
+    PROJECT_ID = st.sidebar.selectbox(
+        'Project',
+        options=list(projects),
+        format_func=lambda project_id: f"{projects[project_id].icon} {projects[project_id].name}",
+        key='input_project'
+    )
+    st.query_params['project'] = PROJECT_ID
+    PROJECT = projects[PROJECT_ID]
+    DATA_KEY, SNAPSHOT_KEY = project_session_keys(PROJECT_ID)
+
+
+# --- LOAD DATA FUNCTION ---
+def load_data_from_db():
+    try:
+        saved_data = load_project_data(conn, PROJECT_ID)
+        # Keep this session's unsaved edits (e.g. a freshly generated narrative)
+        # unless someone has saved a newer row since it was loaded.
+        current_data = st.session_state.get(DATA_KEY)
+        if (current_data is None
+                or current_data.get('project_id') != PROJECT_ID
+                or current_data.get('last_updated') != saved_data.get('last_updated')):
+            # Both reference the shared, read-only record until the user edits.
+            st.session_state[DATA_KEY] = saved_data
+            # What the row looked like when loaded, so saves only write changed fields.
+            st.session_state[SNAPSHOT_KEY] = saved_data
+
+    except Exception as e:
+        st.error(f"🚨 Error during data loading: {e}")
+        import traceback
+        traceback.print_exc()
+        if DATA_KEY not in st.session_state:
+            st.session_state[DATA_KEY] = default_project_data(PROJECT_ID)
+
+
+def refresh_milestones():
+    """Picks up a milestone write and the watermark it moved, keeping unsaved edits."""
+    unedited = st.session_state[DATA_KEY] is st.session_state.get(SNAPSHOT_KEY)
+    saved_data = st.session_state[SNAPSHOT_KEY] = load_project_data(conn, PROJECT_ID)
+    if unedited:
+        st.session_state[DATA_KEY] = saved_data
+    else:
+        current_data = editable_project_data(st.session_state, DATA_KEY)
+        current_data['milestones'] = MilestoneList(saved_data.milestones)
+        current_data['last_updated'] = saved_data.last_updated
+
+
+def draw_project_form():
+    st.title(f'{PROJECT.icon} {PROJECT.name} Data Input Form')
+
+    st.markdown(f'Enter the latest information for the **{PROJECT.name}** project below.')
+
+    # --- INPUT FORM ---
+    # One form per project, so switching projects doesn't carry widget values over.
+    with st.form(f'{PROJECT_ID}_form'):
+        st.subheader('Input Fields')
+        update_input = st.text_area(
+            PROJECT.summary_title,
+            value=st.session_state[DATA_KEY].get('update_bullets', ''),
+            height=100
+        )
+        #--- SUMMARIZATION SECTION ---
+        col1_sum, col2_sum = st.columns([0.7, 0.3])
+        with col1_sum:
+            st.write('**Project Update Narrative (Auto-Generated):**')
+            if not render_narrative_job(f'{PROJECT_ID}_narrative_job', DATA_KEY):
+                st.text_area(
+                    'Generated Update',
+                    value=st.session_state[DATA_KEY].get('update_summary', 'Click "Generate Update" ->'),
+                    height=125,
+                    disabled=True
+                )
+        with col2_sum:
+            st.write('&nbsp;')
+            regenerate_anyway = st.checkbox('Regenerate anyway', key=f'regenerate_{PROJECT_ID}', help='Skip the saved narrative for these bullets and call the model again')
+            generate_update_disabled = not HF_API_TOKEN and backends_need_token()
+            if st.form_submit_button('✨ Generate Narrative', help='Uses AI to write a narrative from the bullet points provided', disabled=generate_update_disabled):
+                if update_input.strip():
+                    st.session_state[f'{PROJECT_ID}_narrative_job'] = submit_narrative_job(
+                        PROJECT.name, update_input, HF_API_TOKEN, conn=conn, bypass_cache=regenerate_anyway
+                    )
+                    st.rerun()
+
+                else:
+                    st.warning('Please enter some update points to generate a update.')
+                    editable_project_data(st.session_state, DATA_KEY)['update_summary'] = ''
+
+        metric_val_input = st.number_input(
+            '📊 Key Metric Value',
+            value=float(st.session_state[DATA_KEY].get('metric_value') or 0.0),
+            format="%.2f" # Format as float
+        )
+        metric_delta_input = st.number_input(
+            '📈 Key Metric Delta (Change)',
+            value=float(st.session_state[DATA_KEY].get('metric_delta') or 0.0),
+            format="%.2f",
+            disabled=True,
+            help='Calculated on save from the previous saved metric value'
+        )
+        risk_input = st.text_area(
+            '❓ Open Questions / Risks',
+            value=st.session_state[DATA_KEY].get('risk', ''),
+            height=150
+        )
+
+        submitted = st.form_submit_button(f'Save {PROJECT.name} Data')
+
+        if submitted:
+            current_data = {
+                'project_id': PROJECT_ID,
+                'update_bullets': update_input,
+                'metric_value': metric_val_input,
+                'metric_delta': metric_delta_input,
+                'milestones': st.session_state[DATA_KEY].get('milestones', []),
+                'risk': risk_input,
+                'update_summary': st.session_state[DATA_KEY].get('update_summary', ''),
+                'last_updated': datetime.datetime.now(datetime.timezone.utc)
+            }
+
+            st.session_state[DATA_KEY] = current_data.copy()
+
+            try:
+                snapshot = st.session_state.get(SNAPSHOT_KEY)
+                written_fields = save_project_data(conn, current_data, snapshot)
+                # Go back to the shared record the save just cached.
+                st.session_state[DATA_KEY] = st.session_state[SNAPSHOT_KEY] = load_project_data(conn, PROJECT_ID)
+                if written_fields:
+                    st.success(f'{PROJECT.name} data updated successfully!')
+                    st.toast("Data saved!")
+                else:
+                    st.info('No changes to save.')
+            except Exception as e:
+                st.error(f"🚨 Failed to save data to PostgreSQL: {e}")
+
+
+def draw_milestones():
+    # --- Milestone Management Section (Below the form) ---
+    st.markdown('---')
+    st.subheader('📅 Upcoming Milestones Management')
+
+    # Get the current list
+    milestone_list = st.session_state[DATA_KEY]['milestones']
+
+    # --- Display Existing Milestones with Remove Buttons ---
+    st.write('**Current Milestones:**')
+    if not milestone_list:
+        st.caption('No milestones added yet.')
+
+    # MilestoneList iterates in date order, so no sort is needed
+    ids_to_remove = []
+    for m in milestone_list:
+        col1, col2, col3 = st.columns([0.25, 0.6, 0.15])
+        with col1:
+            st.write(m.date.strftime('%Y-%m-%d')) # Display date
+        with col2:
+            st.write(m.desc) # Display description
+        with col3:
+            # Use the stable milestone ID in the key and for removal logic
+            if st.button("Remove", key=f"remove_m_{m.milestone_id}", help=f"Remove milestone: {m.desc}"):
+                ids_to_remove.append(m.milestone_id)
+
+    # Remove items outside the loop (modify list while iterating is bad)
+    if ids_to_remove:
+        try:
+            for milestone_id in ids_to_remove:
+                remove_milestone(conn, PROJECT_ID, milestone_id)
+            refresh_milestones()
+        except Exception as e:
+            st.error(f"🚨 Failed to remove milestone: {e}")
+            st.stop()
+        st.toast('Milestone(s) removed.')
+        st.rerun() # Rerun to update the display immediately
+
+    # --- Input for New Milestone ---
+    st.write('**Add New Milestone:**')
+    col_date, col_desc, col_add = st.columns([0.3, 0.55, 0.15])
+
+    with col_date:
+        # Use session state to potentially preserve input if page reruns unexpectedly
+        if 'new_m_date' not in st.session_state:
+            st.session_state.new_m_date = datetime.date.today()
+        new_milestone_date = st.date_input('Date', value=st.session_state.new_m_date, key='new_milestone_date_input')
+
+    with col_desc:
+        if 'new_m_desc' not in st.session_state:
+            st.session_state.new_m_desc = ''
+        new_milestone_desc = st.text_input('Description', value=st.session_state.new_m_desc, key='new_milestone_desc_input', placeholder='Enter milestone detail')
+
+    with col_add:
+        st.write(' &nbsp; ') # Add space for alignment
+        if st.button('Add', key='add_milestone_button'):
+            if new_milestone_desc: # Only add if description is not empty
+                try:
+                    add_milestone(conn, PROJECT_ID, new_milestone_date, new_milestone_desc)
+                    refresh_milestones()
+                except Exception as e:
+                    st.error(f"🚨 Failed to add milestone: {e}")
+                    st.stop()
+                # Clear the input fields by resetting their session state keys
+                st.session_state.new_m_date = datetime.date.today() # Reset date
+                st.session_state.new_m_desc = "" # Reset description
+                st.success(f'Added milestone: {new_milestone_desc}')
+                st.toast('Milestone added!')
+                st.rerun() # Rerun script to update the list display and clear inputs
+            else:
+                st.warning('Please enter a description for the milestone.')
+
+
+if projects:
+    # --- LOAD DATA ---
+    load_data_from_db()
+    draw_project_form()
+    draw_milestones()
+
+
+# --- Project Registry ---
+# A new project is a row in the projects table; no new page is needed.
+st.markdown('---')
+with st.expander('➕ Register a project', expanded=not projects):
+    with st.form('register_project_form', clear_on_submit=True):
+        new_project_id = st.text_input('Project ID', placeholder='e.g. atlas_main',
+                                       help='Lowercase letters, digits and underscores; cannot be changed later')
+        new_project_name = st.text_input('Display name', placeholder='e.g. Atlas')
+        col_icon, col_order = st.columns(2)
+        with col_icon:
+            new_project_icon = st.text_input('Icon', value='📁')
+        with col_order:
+            new_project_order = st.number_input('Sort order', value=len(projects), step=1)
+        new_project_title = st.text_input('Update field title', value='🚀 Project Updates')
+
+        if st.form_submit_button('Register Project'):
+            new_project_id = new_project_id.strip()
+            if not re.fullmatch(r'[a-z0-9_]+', new_project_id):
+                st.warning('Project ID must use only lowercase letters, digits and underscores.')
+            elif not new_project_name.strip():
+                st.warning('Please enter a display name for the project.')
+            else:
+                try:
+                    register_project(conn, new_project_id, new_project_name.strip(),
+                                     icon=new_project_icon.strip() or '📁',
+                                     summary_title=new_project_title.strip() or '🚀 Project Updates',
+                                     sort_order=int(new_project_order))
+                except Exception as e:
+                    st.error(f"🚨 Failed to register project: {e}")
+                    st.stop()
+                # Open the new project's form on the next run.
+                st.session_state.pop('input_project', None)
+                st.query_params['project'] = new_project_id
+                st.toast(f'Registered {new_project_name.strip()}!')
+                st.rerun()
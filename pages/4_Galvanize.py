@@ -1,10 +1,121 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
+from galvanize_utils import (
+    RosterConflict,
+    apply_roster_changes,
+    import_roster,
+    load_roster_filter_options,
+    load_status_counts,
+    load_students_page,
+    read_roster_file,
+    roster_changes,
+    validate_roster
+)
+from hf_utils import get_setting
 
 st.set_page_config(page_title='Galvanize Input', layout='wide')
 st.title('Galvanize Data Input Form')
 
+# --- DATABASE CONNECTION ---
+DB_URL = get_setting("DATABASE_URL", None)
+if not DB_URL:
+    st.error("🚨 DATABASE_URL not found in Streamlit Secrets or the environment! Cannot connect to database.")
+    st.stop()
+
+try:
+    conn = st.connection('postgres', type='sql', url=DB_URL)
+except Exception as e:
+    st.error(f"🚨 Failed to connect to the database: {e}")
+    st.stop()
+
+def reset_roster():
+    """Drops the loaded roster page and pending editor changes so the next run reloads them."""
+    st.session_state.pop('galvanize_roster', None)
+    st.session_state.pop('roster_editor', None)
+
+
+def reset_paging():
+    """Goes back to the first page, e.g. after a filter changes."""
+    reset_roster()
+    st.session_state.pop('roster_page_keys', None)
+
+
+def reset_course():
+    """Clears the cohort filter, whose options depend on the course, then resets paging."""
+    st.session_state.pop('roster_cohort', None)
+    reset_paging()
+
+
+# --- BULK IMPORT ---
+with st.expander('📥 Import roster file'):
+    st.caption(
+        'CSV or Parquet with columns course, cohort, first_name, last_name and optionally '
+        'status and in_utilization. Existing students are matched on course, cohort and name.'
+    )
+    roster_file = st.file_uploader('Roster file', type=['csv', 'parquet'], key='roster_file')
+    if roster_file is not None and st.button('Import roster', key='import_roster_button'):
+        try:
+            valid_rows, rejected_rows = validate_roster(read_roster_file(roster_file))
+        except Exception as e:
+            st.error(f"🚨 Could not read roster file: {e}")
+        else:
+            try:
+                with st.spinner(f'Importing {len(valid_rows)} students...'):
+                    counts = import_roster(conn, valid_rows)
+                st.success(f"Imported roster: {counts['inserted']} added, {counts['updated']} updated.")
+                reset_roster()
+            except Exception as e:
+                st.error(f"🚨 Failed to import roster to PostgreSQL: {e}")
+            if not rejected_rows.empty:
+                st.warning(f'{len(rejected_rows)} row(s) were skipped:')
+                st.dataframe(rejected_rows, use_container_width=True)
+
+# --- FILTERS ---
+ALL = 'All'
+editor_state = st.session_state.get('roster_editor', {})
+pending = (len(editor_state.get('edited_rows', {}))
+           + len(editor_state.get('added_rows', []))
+           + len(editor_state.get('deleted_rows', [])))
+selected_course = st.session_state.get('roster_course', ALL)
+try:
+    courses, cohorts, statuses = load_roster_filter_options(
+        conn, None if selected_course == ALL else selected_course
+    )
+except Exception as e:
+    st.error(f"🚨 Error loading roster filters: {e}")
+    courses, cohorts, statuses = [], [], []
+
+filter_help = 'Save or reload pending edits first' if pending else None
+col_course, col_cohort, col_status = st.columns(3)
+with col_course:
+    course_filter = st.selectbox('Course', [ALL, *courses], key='roster_course',
+                                 on_change=reset_course, disabled=bool(pending), help=filter_help)
+with col_cohort:
+    cohort_filter = st.selectbox('Cohort', [ALL, *cohorts], key='roster_cohort',
+                                 on_change=reset_paging, disabled=bool(pending), help=filter_help)
+with col_status:
+    status_filter = st.selectbox('Status', [ALL, *statuses], key='roster_status',
+                                 on_change=reset_paging, disabled=bool(pending), help=filter_help)
+
+# Only the visible page is loaded and sent to the browser. The page stays in
+# session state until a save, reload or page change, so the editor's row
+# positions and each row's version stay tied to what the user is editing.
+page_keys = st.session_state.setdefault('roster_page_keys', [None])
+if 'galvanize_roster' not in st.session_state:
+    try:
+        st.session_state['galvanize_roster'] = load_students_page(
+            conn,
+            course=None if course_filter == ALL else course_filter,
+            cohort=None if cohort_filter == ALL else cohort_filter,
+            status=None if status_filter == ALL else status_filter,
+            after=page_keys[-1]
+        )
+    except Exception as e:
+        st.error(f"🚨 Error during data loading: {e}")
+        st.session_state['galvanize_roster'] = (pd.DataFrame(), None)
+roster_df, next_page_key = st.session_state['galvanize_roster']
+
 empty_df = pd.DataFrame(columns=[
     'course', 
     'cohort', 
@@ -22,12 +133,20 @@ empty_df = empty_df.astype({
     'status': 'object',
     'in_utilization': 'bool'
 })
+empty_df.insert(0, 'student_id', pd.Series(dtype='Int64'))
+empty_df['version'] = pd.Series(dtype='Int64')
+# Start from the saved roster so cohorts survive a refresh.
+editor_df = empty_df if roster_df.empty else roster_df[list(empty_df.columns)]
 
 edited_df = st.data_editor(
-    empty_df,
+    editor_df,
+    key='roster_editor',
     num_rows='dynamic',
     use_container_width=True,
     column_config={
+        # Row identity for saving edits; not shown.
+        'student_id': None,
+        'version': None,
         'course': st.column_config.TextColumn(
             'Galvanize Course Type',
             help='Enter the Galvanize Course Attended (e.g. SDI, DDI)',
@@ -63,11 +182,60 @@ edited_df = st.data_editor(
     }
 )
 
+# --- SAVE EDITS ---
+# Only the rows changed in the editor are sent, so saving costs the same for any roster size.
+editor_state = st.session_state.get('roster_editor', {})
+pending = (len(editor_state.get('edited_rows', {}))
+           + len(editor_state.get('added_rows', []))
+           + len(editor_state.get('deleted_rows', [])))
+col_save, col_reload, col_prev, col_page, col_next = st.columns([0.2, 0.2, 0.15, 0.3, 0.15])
+with col_save:
+    if st.button(f'💾 Save changes ({pending})', key='save_roster_button', disabled=not pending):
+        try:
+            updates, inserts, deletes = roster_changes(editor_df, editor_state)
+            counts = apply_roster_changes(conn, updates, inserts, deletes)
+        except RosterConflict as e:
+            st.error(f"🚨 {e} Reload the roster and re-apply your edits.")
+        except ValueError as e:
+            st.error(f"🚨 Invalid roster rows: {e}")
+        except Exception as e:
+            st.error(f"🚨 Failed to save roster to PostgreSQL: {e}")
+        else:
+            reset_roster()
+            st.toast(f"Saved: {counts['updated']} updated, {counts['inserted']} added, {counts['deleted']} removed.")
+            st.rerun()
+with col_reload:
+    if st.button('🔄 Reload roster', key='reload_roster_button', help='Discard unsaved edits and load the latest roster'):
+        reset_roster()
+        st.rerun()
+
+# --- PAGING ---
+paging_help = 'Save or reload pending edits first' if pending else None
+with col_prev:
+    if st.button('◀ Previous', key='roster_prev_page', disabled=bool(pending) or len(page_keys) == 1, help=paging_help):
+        page_keys.pop()
+        reset_roster()
+        st.rerun()
+with col_page:
+    st.caption(f'Page {len(page_keys)} · {len(roster_df)} students shown')
+with col_next:
+    if st.button('Next ▶', key='roster_next_page', disabled=bool(pending) or next_page_key is None, help=paging_help):
+        page_keys.append(next_page_key)
+        reset_roster()
+        st.rerun()
+
 st.divider()
-st.write('Data Entered')
+st.write('Saved Roster')
+
+# Counts are kept up to date by the database on every roster write, so this
+# costs the same however many students are stored.
+try:
+    status_counts = load_status_counts(conn)
+except Exception as e:
+    st.error(f"🚨 Error loading roster counts: {e}")
+    status_counts = pd.DataFrame()
 
-if not edited_df.empty:
-    status_counts = edited_df.groupby(['course', 'status']).size().reset_index(name='count')
+if not status_counts.empty:
     unique_statuses = status_counts['status'].unique().tolist()
 
     color_palette = {
@@ -84,7 +252,7 @@ if not edited_df.empty:
                         scale=alt.Scale(domain=unique_statuses, range=status_colors),
                         title='Status'),
         xOffset='status:N',
-        tooltip=['course', 'status', 'count']
+        tooltip=['course', 'status', 'count', 'utilized']
     ).properties(
         title='Student Statuses'
     )
@@ -93,5 +261,6 @@ if not edited_df.empty:
 
     st.write('Data For Chart:')
     st.dataframe(status_counts)
+    st.caption(f"{status_counts['utilized'].sum()} of {status_counts['count'].sum()} students are in utilization.")
 else:
     st.write('The table is currently empty.')
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Local stand-in for the Hugging Face inference API, used by the tests and benchmarks."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive between calls.
+    protocol_version = 'HTTP/1.1'
+    # Avoids Nagle/delayed-ACK stalls between the header and body writes.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        inputs = payload.get('inputs', '')
+
+        if isinstance(inputs, list):
+            body = [{'generated_text': f'Narrative for: {text}'} for text in inputs]
+        else:
+            body = [{'generated_text': f'Narrative for: {inputs}'}]
+        self._send_json(200, body)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LoadingStubHandler(StubHandler):
+    """Answers 503 "model loading" until loading_seconds have passed since the first request."""
+    loading_seconds = 2.0
+    loaded_at = None
+
+    def do_POST(self):
+        cls = type(self)
+        if cls.loaded_at is None:
+            cls.loaded_at = time.monotonic() + cls.loading_seconds
+        remaining = cls.loaded_at - time.monotonic()
+        if remaining > 0:
+            length = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(length)
+            self._send_json(503, {'error': 'Model google/flan-t5-base is currently loading',
+                                  'estimated_time': remaining})
+            return
+        super().do_POST()
+
+
+class StreamingStubHandler(StubHandler):
+    """Answers "stream": true requests with text-generation server-sent events."""
+    tokens = ['The', ' team', ' shipped', ' the', ' release', ' on', ' schedule', '.']
+    token_delay = 0.1
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if not payload.get('stream'):
+            time.sleep(self.token_delay * len(self.tokens))
+            self._send_json(200, [{'generated_text': ''.join(self.tokens)}])
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, text in enumerate(self.tokens):
+            time.sleep(self.token_delay)
+            last = i == len(self.tokens) - 1
+            event = {
+                'token': {'id': i, 'text': text, 'special': False},
+                'generated_text': ''.join(self.tokens) if last else None
+            }
+            chunk = f'data:{json.dumps(event)}\n\n'.encode()
+            self.wfile.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def start_stub_server(handler=StubHandler):
+    """Starts the stub on a free local port and returns (server, url)."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/models/stub'
@@ -0,0 +1,127 @@
+"""Change feed triggers and ChangeListener against a locally run Postgres.
+
+Set TEST_DATABASE_URL (e.g. postgresql+psycopg2://localhost/dashboard_test) to
+run; the tests are skipped without it. They install triggers and migrate
+tables, so never point it at the app's DATABASE_URL.
+"""
+import datetime
+import os
+import time
+import uuid
+
+import pytest
+import sqlalchemy
+import streamlit as st
+
+from db_utils import ChangeListener, ProjectRecord, ensure_change_feed, get_project_cache
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+
+@pytest.fixture
+def conn():
+    conn = st.connection('postgres_test', type='sql', url=TEST_DATABASE_URL)
+    with conn.session as s:
+        s.execute(sqlalchemy.text("""
+            CREATE TABLE IF NOT EXISTS dashboard_data (
+                project_id TEXT PRIMARY KEY,
+                update_bullets TEXT,
+                metric_value NUMERIC,
+                metric_delta NUMERIC,
+                milestones JSON,
+                risk TEXT,
+                update_summary TEXT,
+                last_updated TIMESTAMPTZ
+            )
+        """))
+        s.commit()
+    ensure_change_feed(conn)
+    return conn
+
+
+@pytest.fixture
+def project_id(conn):
+    project_id = f'change_feed_test_{uuid.uuid4().hex[:8]}'
+    yield project_id
+    with conn.session as s:
+        s.execute(sqlalchemy.text("DELETE FROM milestones WHERE project_id = :pid"), {'pid': project_id})
+        s.execute(sqlalchemy.text("DELETE FROM dashboard_data WHERE project_id = :pid"), {'pid': project_id})
+        s.commit()
+
+
+@pytest.fixture
+def listener(conn):
+    listener = ChangeListener(conn.engine)
+    assert listener.wait_connected(timeout=5)
+    yield listener
+    listener.stop()
+
+
+def wait_for_version(listener, project_id, version, timeout=5):
+    deadline = time.monotonic() + timeout
+    while listener.version(project_id) < version and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return listener.version(project_id)
+
+
+def cache_project(project_id):
+    get_project_cache().put(ProjectRecord(project_id, last_updated=datetime.datetime.now(datetime.timezone.utc)))
+    assert get_project_cache().get(project_id) is not None
+
+
+def test_dashboard_data_write_bumps_version_and_drops_cache(conn, listener, project_id):
+    cache_project(project_id)
+    with conn.session as s:
+        s.execute(
+            sqlalchemy.text("INSERT INTO dashboard_data (project_id, risk, last_updated) VALUES (:pid, 'new', now())"),
+            {'pid': project_id}
+        )
+        s.commit()
+
+    assert wait_for_version(listener, project_id, 1) == 1
+    assert get_project_cache().get(project_id) is None
+
+    cache_project(project_id)
+    with conn.session as s:
+        s.execute(
+            sqlalchemy.text("UPDATE dashboard_data SET risk = 'changed' WHERE project_id = :pid"),
+            {'pid': project_id}
+        )
+        s.commit()
+
+    assert wait_for_version(listener, project_id, 2) == 2
+    assert get_project_cache().get(project_id) is None
+
+
+def test_milestone_write_bumps_version_and_drops_cache(conn, listener, project_id):
+    cache_project(project_id)
+    with conn.session as s:
+        s.execute(
+            sqlalchemy.text("""
+                INSERT INTO milestones (project_id, milestone_id, milestone_date, description)
+                VALUES (:pid, 'm1', current_date, 'Launch')
+            """),
+            {'pid': project_id}
+        )
+        s.commit()
+
+    assert wait_for_version(listener, project_id, 1) == 1
+    assert get_project_cache().get(project_id) is None
+
+
+def test_cached_rows_need_no_check_while_listening(conn, project_id):
+    cache = get_project_cache()
+    listener = ChangeListener(conn.engine)
+    try:
+        assert listener.wait_connected(timeout=5)
+        cache_project(project_id)
+        with cache._lock:
+            record, last_updated, _ = cache._entries[project_id]
+            cache._entries[project_id] = (record, last_updated, time.monotonic() - cache.check_interval)
+        assert cache.get(project_id)[2] is False
+    finally:
+        listener.stop()
+    assert cache.listening is False
+    assert cache.get(project_id)[2] is True
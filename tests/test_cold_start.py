@@ -0,0 +1,58 @@
+"""Cold-start retries against a stub model that answers 503 while it loads."""
+import time
+
+import hf_utils
+from hf_stub_server import LoadingStubHandler, start_stub_server
+
+LOADING_SECONDS = 1.5
+
+
+def loading_stub():
+    class Handler(LoadingStubHandler):
+        loading_seconds = LOADING_SECONDS
+        loaded_at = None
+
+    return start_stub_server(Handler)
+
+
+def test_loading_model_is_retried_until_it_answers():
+    server, url = loading_stub()
+    requests_before = hf_utils.get_inference_stats().snapshot()['upstream_requests']
+    try:
+        start = time.perf_counter()
+        result = hf_utils.query_hf_narrative_generation('cold start retry', 'x', api_url=url)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert result == [{'generated_text': 'Narrative for: cold start retry'}]
+    # At least one 503 came back and was retried.
+    assert hf_utils.get_inference_stats().snapshot()['upstream_requests'] - requests_before >= 2
+    # Answered about when the model finished loading, not after a fixed long wait.
+    assert elapsed < LOADING_SECONDS * 1.1 + 1.0
+
+
+def test_loading_model_without_retries_reports_the_503():
+    server, url = loading_stub()
+    try:
+        result = hf_utils.query_hf_narrative_generation('cold start no retry', 'x', api_url=url, max_retries=0)
+    finally:
+        server.shutdown()
+
+    assert 'error' in result
+    assert '503' in result['error']
+
+
+def test_retry_budget_gives_up_on_a_long_load():
+    server, url = loading_stub()
+    try:
+        start = time.perf_counter()
+        result = hf_utils.query_hf_narrative_generation(
+            'cold start over budget', 'x', api_url=url, retry_budget=LOADING_SECONDS / 3
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert '503' in result['error']
+    assert elapsed < LOADING_SECONDS / 3
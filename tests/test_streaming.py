@@ -0,0 +1,38 @@
+"""Streaming generation against a stub that sends text-generation server-sent events."""
+import time
+
+import hf_utils
+from hf_stub_server import StreamingStubHandler, StubHandler, start_stub_server
+
+FULL_TEXT = ''.join(StreamingStubHandler.tokens)
+FULL_COMPLETION_SECONDS = StreamingStubHandler.token_delay * len(StreamingStubHandler.tokens)
+
+
+def test_first_token_arrives_before_the_full_completion():
+    server, url = start_stub_server(StreamingStubHandler)
+    try:
+        start = time.perf_counter()
+        first_token = None
+        tokens = []
+        for token in hf_utils.stream_hf_narrative_generation('streaming first token', 'x', api_url=url):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            tokens.append(token)
+        streamed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert ''.join(tokens) == FULL_TEXT
+    assert first_token < FULL_COMPLETION_SECONDS / 2
+    assert streamed >= FULL_COMPLETION_SECONDS * 0.9
+
+
+def test_json_answer_to_a_stream_request_is_yielded():
+    # This stub ignores "stream": true and sends the usual JSON list.
+    server, url = start_stub_server(StubHandler)
+    try:
+        tokens = list(hf_utils.stream_hf_narrative_generation('streaming json', 'x', api_url=url))
+    finally:
+        server.shutdown()
+
+    assert tokens == ['Narrative for: streaming json']